@@ -0,0 +1,241 @@
+"""Хранение вложений по содержимому и их отдача с поддержкой Range."""
+import hashlib
+import os
+import re
+import tempfile
+import time
+from http import HTTPStatus
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import transaction
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+
+from .models import Blob
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Типы, которые браузер может показать сам, не исполняя содержимое.
+# Остальные отдаются как файл для скачивания.
+INLINE_TYPES = frozenset((
+    'application/pdf', 'image/gif', 'image/jpeg', 'image/png',
+    'image/webp', 'text/plain',
+))
+
+
+def blob_root():
+    return Path(settings.NOTES_BLOB_ROOT)
+
+
+def blob_path(sha256):
+    return blob_root() / sha256[:2] / sha256[2:4] / sha256
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """Пишет загружаемый файл на диск по частям, попутно считая хеш.
+
+    Временный файл создаётся рядом с хранилищем, чтобы затем
+    переместить его на место атомарным переименованием без копирования.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        tmp_dir = blob_root() / 'tmp'
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.NOTES_ATTACHMENT_MAX_SIZE:
+            self.upload_interrupted()
+            raise StopUpload(connection_reset=True)
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        uploaded = UploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        uploaded.sha256 = self.digest.hexdigest()
+        return uploaded
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+            Path(self.file.name).unlink(missing_ok=True)
+
+
+def store_blob(uploaded):
+    """Кладёт загруженный файл в хранилище; дубликат не сохраняется.
+
+    Запись о содержимом обновляется в транзакции, создающей вложение,
+    а файл перемещается на место только после её фиксации: при откате
+    он остаётся во временном каталоге, и его удалит очистка. Очистка,
+    начавшаяся после фиксации, увидит свежую отметку touched.
+    """
+    now = timezone.now()
+    blob, _ = Blob.objects.update_or_create(
+        sha256=uploaded.sha256,
+        defaults={'touched': now},
+        create_defaults={'size': uploaded.size, 'touched': now},
+    )
+    uploaded.close()
+    transaction.on_commit(
+        lambda: _place(uploaded.file.name, blob_path(uploaded.sha256))
+    )
+    return blob
+
+
+def _place(tmp_name, path):
+    if path.exists():
+        os.unlink(tmp_name)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, path)
+
+
+def _parse_range(header, size):
+    """Границы единственного диапазона из заголовка Range.
+
+    Возвращает None, если заголовок нужно проигнорировать, и пустой
+    кортеж для невыполнимого диапазона.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end or not int(end):
+            return ()
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return ()
+    return start, end
+
+
+class _FileRange:
+    """Файл, из которого читается не больше length байт."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def serve(request, attachment):
+    """Ответ с файлом вложения.
+
+    Полный файл отдаётся через FileResponse, и WSGI-сервер может
+    передать его через sendfile. Диапазон до конца файла отдаётся так
+    же, с уже сдвинутой позицией; диапазон в середине читается
+    по частям. ETag - хеш содержимого, он не меняется никогда.
+    Типы не из INLINE_TYPES отдаются для скачивания, чтобы загруженный
+    HTML не открылся от имени сайта.
+    """
+    blob = attachment.blob
+    etag = f'"{blob.sha256}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=HTTPStatus.NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+    byte_range = None
+    if 'Range' in request.headers and request.headers.get(
+        'If-Range', etag
+    ) == etag:
+        byte_range = _parse_range(request.headers['Range'], blob.size)
+    if byte_range == ():
+        response = HttpResponse(
+            status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        response['Content-Range'] = f'bytes */{blob.size}'
+        return response
+    file = open(blob_path(blob.sha256), 'rb')
+    as_attachment = attachment.content_type not in INLINE_TYPES
+    if byte_range is None:
+        response = FileResponse(
+            file, as_attachment=as_attachment, filename=attachment.name
+        )
+    else:
+        start, end = byte_range
+        file.seek(start)
+        if end < blob.size - 1:
+            file = _FileRange(file, end - start + 1)
+        response = FileResponse(
+            file, as_attachment=as_attachment, filename=attachment.name
+        )
+        response.status_code = HTTPStatus.PARTIAL_CONTENT
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{blob.size}'
+    response['Content-Type'] = attachment.content_type
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
+
+
+def sweep_orphans(grace, batch_size):
+    """Удаляет содержимое, на которое не ссылается ни одно вложение.
+
+    Файлы удаляются до фиксации транзакции, пока она удерживает
+    блокировку записи: загрузка того же содержимого дождётся её
+    и положит файл заново.
+    """
+    removed = 0
+    last = ''
+    while True:
+        orphaned = Blob.objects.filter(
+            attachments__isnull=True, touched__lt=timezone.now() - grace
+        )
+        with transaction.atomic():
+            batch = list(orphaned.filter(sha256__gt=last).order_by(
+                'sha256'
+            ).values_list('sha256', flat=True)[:batch_size])
+            if not batch:
+                break
+            last = batch[-1]
+            # Условия проверяются повторно: содержимое могли загрузить
+            # снова между выборкой и удалением.
+            orphaned.filter(sha256__in=batch).delete()
+            kept = set(Blob.objects.filter(
+                sha256__in=batch
+            ).values_list('sha256', flat=True))
+            deleted = [sha256 for sha256 in batch if sha256 not in kept]
+            for sha256 in deleted:
+                blob_path(sha256).unlink(missing_ok=True)
+        removed += len(deleted)
+    _sweep_tmp(grace)
+    return removed
+
+
+def _sweep_tmp(grace):
+    """Удаляет временные файлы прерванных загрузок."""
+    tmp_dir = blob_root() / 'tmp'
+    if not tmp_dir.exists():
+        return
+    deadline = time.time() - grace.total_seconds()
+    for path in tmp_dir.iterdir():
+        if path.stat().st_mtime < deadline:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,144 @@
+"""Пакетное удаление и правка заметок одной транзакцией."""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Length
+
+from .changes import record_changes
+from .forms import WARNING, NoteBatchForm
+from .models import Note, NoteChange, NoteTag, Tag
+from .signals import delete_handled_in_bulk
+from .stats import apply_delta
+
+MAX_BATCH = 500
+
+UPDATED = 'updated'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def resolve(notes, refs):
+    """Заметки из notes по ссылкам: числа - id, строки - slug.
+
+    Возвращает словарь ссылка -> заметка, ненайденных ссылок в нём нет.
+    """
+    ids = {ref for ref in refs if isinstance(ref, int)}
+    slugs = {ref for ref in refs if isinstance(ref, str)}
+    found = {}
+    for note in notes.filter(Q(pk__in=ids) | Q(slug__in=slugs)):
+        if note.pk in ids:
+            found[note.pk] = note
+        if note.slug in slugs:
+            found[note.slug] = note
+    return found
+
+
+def _release_tags(note_ids):
+    """Уменьшает счётчики тегов удаляемых заметок по запросу на сдвиг."""
+    deltas = defaultdict(list)
+    for row in NoteTag.objects.filter(note_id__in=note_ids).values(
+        'tag_id'
+    ).annotate(count=Count('id')).order_by():
+        deltas[row['count']].append(row['tag_id'])
+    for count, tag_ids in deltas.items():
+        Tag.objects.filter(pk__in=tag_ids).update(
+            note_count=F('note_count') - count
+        )
+
+
+@transaction.atomic
+def batch_delete(notes, refs):
+    """Удаляет заметки из notes по ссылкам одним DELETE.
+
+    Журнал, статистика и счётчики тегов обновляются для всей пачки
+    сразу, обработчики удаления отдельных заметок отключаются.
+    Возвращает статусы в порядке ссылок.
+    """
+    found = resolve(
+        notes.only('pk', 'slug', 'author_id').annotate(size=Length('text')),
+        refs,
+    )
+    targets = list({note.pk: note for note in found.values()}.values())
+    if targets:
+        note_ids = [note.pk for note in targets]
+        _release_tags(note_ids)
+        record_changes(targets, NoteChange.DELETE)
+        removed = defaultdict(lambda: [0, 0])
+        for note in targets:
+            removed[note.author_id][0] += 1
+            removed[note.author_id][1] += note.size
+        with delete_handled_in_bulk():
+            Note.objects.filter(pk__in=note_ids).delete()
+        # После DELETE: пропавшая статистика пересобирается без удалённых.
+        for author_id, (count, size) in removed.items():
+            apply_delta(author_id, notes=-count, size=-size)
+    return [
+        {'note': ref, 'status': DELETED if ref in found else NOT_FOUND}
+        for ref in refs
+    ]
+
+
+@transaction.atomic
+def batch_update(notes, items):
+    """Меняет заголовки и slug заметок из notes одним bulk_update.
+
+    Каждый элемент - словарь со ссылкой note и новыми значениями полей
+    title и slug. Проверки полей и уникальности slug те же, что в
+    NoteForm; заметки с ошибками пропускаются, остальные сохраняются.
+    Возвращает статусы в порядке элементов.
+    """
+    found = resolve(notes, [item.get('note') for item in items])
+    results = []
+    forms = {}
+    seen = Counter(
+        found[item.get('note')].pk for item in items
+        if item.get('note') in found
+    )
+    for item in items:
+        ref = item.get('note')
+        result = {'note': ref}
+        results.append(result)
+        if ref not in found:
+            result['status'] = NOT_FOUND
+            continue
+        note = found[ref]
+        if seen[note.pk] > 1:
+            result['status'] = INVALID
+            result['errors'] = {'note': [{
+                'message': 'Заметка указана несколько раз.',
+                'code': 'duplicate',
+            }]}
+            continue
+        form = NoteBatchForm(
+            data={
+                'title': item.get('title', note.title),
+                'slug': item.get('slug', note.slug),
+            },
+            instance=note,
+        )
+        if not form.is_valid():
+            result['status'] = INVALID
+            result['errors'] = form.errors.get_json_data()
+            continue
+        forms[note.pk] = (result, form)
+    slugs = Counter(form.instance.slug for _, form in forms.values())
+    taken = dict(Note.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+    valid = []
+    for pk, (result, form) in forms.items():
+        slug = form.instance.slug
+        if slugs[slug] > 1 or taken.get(slug, pk) != pk:
+            result['status'] = INVALID
+            result['errors'] = {'slug': [{'message': slug + WARNING,
+                                          'code': 'unique'}]}
+            continue
+        result['status'] = UPDATED
+        result['slug'] = slug
+        valid.append(form.instance)
+    if valid:
+        Note.objects.bulk_update(valid, ('title', 'slug'))
+        record_changes(valid, NoteChange.UPSERT)
+        for author_id in {note.author_id for note in valid}:
+            apply_delta(author_id)
+    return results
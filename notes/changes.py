@@ -0,0 +1,117 @@
+"""Журнал изменений заметок для инкрементальной синхронизации."""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from .events import publish_changes
+from .models import ChangeLogHorizon, Note, NoteChange
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+class CursorExpired(Exception):
+    """Курсор старше горизонта сжатия журнала."""
+
+
+def record_changes(notes, op):
+    """Записывает в журнал изменения нескольких заметок одним запросом.
+
+    После фиксации транзакции изменения публикуются SSE-подписчикам.
+    """
+    changes = NoteChange.objects.bulk_create(
+        NoteChange(author_id=note.author_id, note_id=note.pk,
+                   slug=note.slug, op=op)
+        for note in notes
+    )
+    transaction.on_commit(lambda: publish_changes(changes))
+    return changes
+
+
+def changes_since(author, since, limit=DEFAULT_LIMIT):
+    """Пачка изменений после курсора since.
+
+    Возвращает список изменений, новый курсор и признак того,
+    что за пачкой есть ещё изменения.
+    """
+    horizon = ChangeLogHorizon.objects.filter(author=author).values_list(
+        'seq', flat=True
+    ).first()
+    if since and horizon and since < horizon:
+        raise CursorExpired
+    limit = max(1, min(limit, MAX_LIMIT))
+    batch = list(NoteChange.objects.filter(
+        author=author, seq__gt=since
+    ).order_by('seq')[:limit + 1])
+    has_more = len(batch) > limit
+    batch = batch[:limit]
+    # В пачке нужна только последняя запись по каждой заметке.
+    latest = {change.note_id: change for change in batch}
+    notes = Note.objects.filter(author=author).in_bulk([
+        change.note_id for change in latest.values()
+        if change.op == NoteChange.UPSERT
+    ])
+    changes = []
+    for change in sorted(latest.values(), key=lambda change: change.seq):
+        item = {
+            'seq': change.seq,
+            'op': change.op,
+            'id': change.note_id,
+            'slug': change.slug,
+        }
+        if change.op == NoteChange.UPSERT:
+            note = notes.get(change.note_id)
+            if note is None:
+                # Заметку уже удалили, tombstone придёт в следующих пачках.
+                continue
+            item.update(slug=note.slug, title=note.title, text=note.text)
+        changes.append(item)
+    cursor = batch[-1].seq if batch else since
+    return changes, cursor, has_more
+
+
+def compact_superseded(batch_size):
+    """Удаляет записи, перекрытые более поздними по той же заметке.
+
+    Клиент с любым курсором всё равно получит более позднюю запись,
+    поэтому сжатие не влияет на результат синхронизации.
+    """
+    superseded = NoteChange.objects.filter(Exists(NoteChange.objects.filter(
+        note_id=OuterRef('note_id'), seq__gt=OuterRef('seq')
+    ))).order_by('seq')
+    removed = 0
+    while True:
+        seqs = list(superseded.values_list('seq', flat=True)[:batch_size])
+        if not seqs:
+            return removed
+        removed += NoteChange.objects.filter(seq__in=seqs).delete()[0]
+
+
+def purge_tombstones(ttl, batch_size):
+    """Удаляет записи об удалении старше ttl и сдвигает горизонты."""
+    expired = NoteChange.objects.filter(
+        op=NoteChange.DELETE, created__lt=timezone.now() - ttl
+    ).order_by('seq')
+    removed = 0
+    while True:
+        seqs = list(expired.values_list('seq', flat=True)[:batch_size])
+        if not seqs:
+            return removed
+        with transaction.atomic():
+            batch = NoteChange.objects.filter(seq__in=seqs)
+            for row in batch.values('author').annotate(last=Max('seq')):
+                horizon, _ = ChangeLogHorizon.objects.select_for_update(
+                ).get_or_create(author_id=row['author'])
+                horizon.seq = max(horizon.seq, row['last'])
+                horizon.save(update_fields=('seq',))
+            removed += batch.delete()[0]
+
+
+def compact(ttl_days, batch_size):
+    """Сжимает журнал: перекрытые записи и устаревшие tombstone."""
+    return (
+        compact_superseded(batch_size),
+        purge_tombstones(timedelta(days=ttl_days), batch_size),
+    )
@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from .stats import get_stats
+
+
+def note_stats(request):
+    """Статистика заметок для шапки; запрос выполняется при обращении."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'note_stats': SimpleLazyObject(lambda: get_stats(user))}
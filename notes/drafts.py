@@ -0,0 +1,170 @@
+"""Буфер автосохранения черновиков с отложенной пакетной записью.
+
+Частые сохранения формы накапливаются в памяти процесса, причём
+изменения одного черновика схлопываются в одну запись. Буфер
+сбрасывается в базу одной транзакцией по таймеру или при достижении
+порога размера, поэтому при падении процесса теряется не больше
+одного интервала сброса.
+"""
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Note, NoteDraft
+
+FIELDS = ('title', 'text', 'slug')
+NEW = 'new'
+
+
+def draft_key(note=None):
+    return NEW if note is None else str(note.pk)
+
+
+class DraftBuffer:
+    """Буфер черновиков одного процесса."""
+
+    def __init__(self, interval=None, max_pending=None):
+        self._interval = interval
+        self._max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Сброс и удаление черновика не должны перемежаться: иначе сброс,
+        # уже забравший черновик из буфера, вернул бы удалённую строку.
+        self._write_lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def interval(self):
+        if self._interval is not None:
+            return self._interval
+        return settings.NOTES_DRAFTS_FLUSH_INTERVAL
+
+    @property
+    def max_pending(self):
+        return self._max_pending or settings.NOTES_DRAFTS_MAX_PENDING
+
+    def add(self, author_id, key, note_id, fields):
+        """Добавляет частичное обновление черновика в буфер."""
+        with self._lock:
+            entry = self._pending.setdefault(
+                (author_id, key), {'note_id': note_id}
+            )
+            entry.update(
+                {name: fields[name] for name in FIELDS if name in fields},
+                updated=timezone.now(),
+            )
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self.flush()
+        else:
+            self._schedule()
+
+    def load(self, author_id, key):
+        """Поля черновика с учётом ещё не записанных изменений."""
+        draft = NoteDraft.objects.filter(
+            author_id=author_id, key=key
+        ).values(*FIELDS).first() or {}
+        with self._lock:
+            pending = self._pending.get((author_id, key), {})
+        draft.update(
+            {name: pending[name] for name in FIELDS if name in pending}
+        )
+        return draft
+
+    def discard(self, author_id, key):
+        """Удаляет черновик, когда заметка сохранена."""
+        with self._write_lock:
+            with self._lock:
+                self._pending.pop((author_id, key), None)
+            NoteDraft.objects.filter(author_id=author_id, key=key).delete()
+
+    def drop_note(self, note_id):
+        """Убирает из буфера черновики удалённой заметки."""
+        with self._lock:
+            for key in [key for key, entry in self._pending.items()
+                        if entry['note_id'] == note_id]:
+                del self._pending[key]
+
+    def flush(self):
+        """Записывает накопленные черновики одной транзакцией."""
+        with self._write_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            self._write(pending)
+        except IntegrityError:
+            # Черновик, нарушающий ограничения, не запишется и позже.
+            # Пишем по одному, чтобы не потерять остальные.
+            for key, entry in pending.items():
+                try:
+                    self._write({key: entry})
+                except IntegrityError:
+                    pass
+        except Exception:
+            with self._lock:
+                for key, entry in pending.items():
+                    newer = self._pending.get(key, {})
+                    self._pending[key] = {**entry, **newer}
+            self._schedule()
+            raise
+        return len(pending)
+
+    @staticmethod
+    @transaction.atomic
+    def _write(pending):
+        # Черновики удалённых заметок пропускаются: запись о них нарушила
+        # бы внешний ключ.
+        note_ids = {entry['note_id'] for entry in pending.values()} - {None}
+        if note_ids:
+            note_ids = set(Note.objects.filter(
+                pk__in=note_ids
+            ).values_list('pk', flat=True))
+        # Частичные обновления с одинаковым набором полей пишутся одним
+        # INSERT ... ON CONFLICT DO UPDATE, не затирая остальные поля.
+        groups = {}
+        for (author_id, key), entry in pending.items():
+            if entry['note_id'] is not None and (
+                entry['note_id'] not in note_ids
+            ):
+                continue
+            fields = tuple(name for name in FIELDS if name in entry)
+            groups.setdefault(fields, []).append(NoteDraft(
+                author_id=author_id, key=key, **entry
+            ))
+        for fields, drafts in groups.items():
+            NoteDraft.objects.bulk_create(
+                drafts,
+                update_conflicts=True,
+                unique_fields=('author', 'key'),
+                update_fields=(*fields, 'note', 'updated'),
+            )
+
+    def _schedule(self):
+        if not self.interval:
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.interval, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+
+buffer = DraftBuffer()
+atexit.register(buffer.flush)
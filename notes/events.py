@@ -0,0 +1,136 @@
+"""Публикация событий об изменениях заметок для SSE-подписчиков.
+
+Подписчики живут в event loop ASGI-сервера, а изменения публикуются
+из синхронного кода представлений, поэтому события передаются в loop
+через call_soon_threadsafe. Каждому подписчику выделяется очередь
+ограниченного размера: медленный клиент, не успевающий её разбирать,
+отключается и догоняет пропущенное по журналу изменений после
+переподключения с Last-Event-ID.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+QUEUE_SIZE = 100
+OVERFLOW = object()
+
+
+class Subscription:
+    """Очередь событий одного SSE-соединения."""
+
+    def __init__(self, author_id, queue_size):
+        self.author_id = author_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, event):
+        """Кладёт событие в очередь; вызывается только из loop."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self, timeout):
+        """Следующее событие или None, если за timeout ничего не пришло."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """Внутрипроцессный pub/sub событий по авторам заметок."""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._poller = None
+
+    def subscribe(self, author_id):
+        subscription = Subscription(author_id, self.queue_size)
+        with self._lock:
+            self._subscribers[author_id].add(subscription)
+        self._start_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers[subscription.author_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.author_id]
+
+    def publish(self, author_id, event):
+        """Рассылает событие подписчикам автора из любого потока."""
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(author_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.push, event
+                )
+            except RuntimeError:
+                # Event loop подписчика уже закрыт.
+                self.unsubscribe(subscription)
+
+    def _start_poller(self):
+        """Запускает опрос журнала изменений, если он включён."""
+        interval = getattr(settings, 'NOTES_EVENTS_OUTBOX_POLL', None)
+        if not interval or (self._poller and not self._poller.done()):
+            return
+        self._poller = asyncio.get_running_loop().create_task(
+            self._poll_outbox(interval)
+        )
+
+    async def _poll_outbox(self, interval):
+        """Публикует изменения, записанные в журнал любым процессом."""
+        from .models import NoteChange
+
+        @sync_to_async(thread_sensitive=False)
+        def fetch(last_seq):
+            changes = NoteChange.objects.order_by('seq')
+            if last_seq is None:
+                return list(changes.reverse()[:1])
+            return list(changes.filter(seq__gt=last_seq)[:QUEUE_SIZE])
+
+        last_seq = None
+        while True:
+            changes = await fetch(last_seq)
+            if last_seq is None:
+                last_seq = changes[0].seq if changes else 0
+                changes = []
+            for change in changes:
+                self.publish(change.author_id, change_event(change))
+                last_seq = change.seq
+            if len(changes) < QUEUE_SIZE:
+                await asyncio.sleep(interval)
+
+
+def change_event(change):
+    return {
+        'seq': change.seq,
+        'op': change.op,
+        'id': change.note_id,
+        'slug': change.slug,
+    }
+
+
+def publish_changes(changes):
+    """Публикует записи журнала в процессе, где они сделаны.
+
+    При включённом опросе журнала события рассылает он, в том числе
+    изменения из других процессов.
+    """
+    if getattr(settings, 'NOTES_EVENTS_OUTBOX_POLL', None):
+        return
+    for change in changes:
+        broker.publish(change.author_id, change_event(change))
+
+
+broker = Broker()
@@ -0,0 +1,82 @@
+"""Потоковая выгрузка заметок пользователя в ZIP-архив."""
+import time
+import zipfile
+
+from asgiref.sync import sync_to_async
+
+from .models import Note
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+
+
+class _Sink:
+    """Приёмник, в который zipfile пишет архив.
+
+    У него нет tell и seek, поэтому zipfile пишет архив строго
+    последовательно, с дескрипторами данных после каждого файла.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def iterate_notes(author, after_pk=0, batch_size=BATCH_SIZE):
+    """Заметки автора по возрастанию id, пачками по первичному ключу."""
+    notes = Note.objects.filter(author=author).order_by('pk').only(
+        'pk', 'slug', 'title', 'text'
+    )
+    while True:
+        batch = list(notes.filter(pk__gt=after_pk)[:batch_size])
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after_pk = batch[-1].pk
+
+
+def note_file(note):
+    return f'# {note.title}\n\n{note.text}\n'.encode()
+
+
+def export_archive(author, after_pk=0, batch_size=BATCH_SIZE):
+    """Части ZIP-архива с заметками автора, по файлу на заметку.
+
+    В памяти держится только текущая пачка заметок и каталог архива,
+    который zipfile обязан записать в конце.
+    """
+    sink = _Sink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for batch in iterate_notes(author, after_pk, batch_size):
+            for note in batch:
+                info = zipfile.ZipInfo(f'{note.slug}.md', date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, note_file(note))
+                if len(sink.buffer) >= CHUNK_SIZE:
+                    yield sink.take()
+            if sink.buffer:
+                yield sink.take()
+    yield sink.take()
+
+
+async def aiterate(iterator):
+    """Асинхронная обёртка, отдающая части по одной.
+
+    Без неё ASGI-обработчик Django собрал бы весь архив в список.
+    """
+    done = object()
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, done)) is not done:
+        yield chunk
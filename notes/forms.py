@@ -2,19 +2,40 @@ from pytils.translit import slugify
 
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 
-from .models import Note
+from .models import Note, Tag
+from .tags import format_tags, parse_tags, set_tags
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    tags = forms.CharField(
+        label='Теги',
+        required=False,
+        help_text='Перечислите теги через запятую',
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial.setdefault('tags', format_tags(self.instance))
+
+    def clean_tags(self):
+        """Приводит теги к нижнему регистру и убирает повторы."""
+        names = parse_tags(self.cleaned_data['tags'])
+        max_length = Tag._meta.get_field('name').max_length
+        too_long = [name for name in names if len(name) > max_length]
+        if too_long:
+            raise ValidationError(f'Слишком длинный тег: {too_long[0]}')
+        return names
+
     def clean_slug(self):
         """Обрабатывает случай, если slug не уникален."""
         cleaned_data = super().clean()
@@ -27,3 +48,33 @@ class NoteForm(forms.ModelForm):
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit)
+        with transaction.atomic():
+            note = super().save(commit)
+            set_tags(note, self.cleaned_data['tags'])
+        return note
+
+
+class NoteBatchForm(forms.ModelForm):
+    """Поля заметки, которые можно менять в пакетном запросе.
+
+    Уникальность slug проверяется сразу для всей пачки, без запроса
+    на каждую заметку.
+    """
+
+    class Meta:
+        model = Note
+        fields = ('title', 'slug')
+
+    def clean_slug(self):
+        """Пустой slug строится по заголовку, как в NoteForm."""
+        slug = self.cleaned_data.get('slug')
+        if not slug:
+            slug = slugify(self.cleaned_data.get('title', ''))[:100]
+        return slug
+
+    def validate_unique(self):
+        pass
@@ -0,0 +1,81 @@
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from notes.models import Note
+from notes.rendering import render
+
+PARAGRAPH = (
+    '## Раздел\n\n'
+    'Текст с **выделением**, *курсивом*, `кодом` и '
+    '[ссылкой](https://example.com).\n\n'
+    '- первый пункт\n- второй пункт\n\n'
+    '```\nprint("пример")\n```\n\n'
+)
+
+
+class Rollback(Exception):
+    """Откатывает данные, созданные для замера."""
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время ответа страницы заметки с заранее '
+            'отрисованным HTML и с отрисовкой при каждом запросе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--paragraphs',
+            type=int,
+            default=200,
+            help='Размер текста заметки в абзацах.',
+        )
+
+    def _measure(self, client, url, requests):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def _report(self, name, timings):
+        quantiles = statistics.quantiles(timings, n=20)
+        self.stdout.write(
+            f'{name:<15} медиана {statistics.median(timings):8.2f} мс, '
+            f'p95 {quantiles[-1]:8.2f} мс'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create(
+                    username='bench-render'
+                )
+                note = Note.objects.create(
+                    title='Замер', text=PARAGRAPH * options['paragraphs'],
+                    slug='bench-render', author=user,
+                )
+                client = Client()
+                client.force_login(user)
+                url = reverse('notes:detail', args=(note.slug,))
+                self._report('предрасчёт', self._measure(
+                    client, url, options['requests']
+                ))
+                on_the_fly = property(
+                    lambda note: mark_safe(render(note.text))
+                )
+                with mock.patch.object(Note, 'html', on_the_fly):
+                    self._report('на лету', self._measure(
+                        client, url, options['requests']
+                    ))
+                raise Rollback
+        except Rollback:
+            pass
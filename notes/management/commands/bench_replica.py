@@ -0,0 +1,89 @@
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from notes.models import Note
+
+
+def _read(user_pk, seconds):
+    """Читает список заметок в дочернем процессе; время ответов в мс."""
+    client = Client()
+    client.force_login(get_user_model().objects.get(pk=user_pk))
+    url = reverse('notes:list')
+    timings = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _write(note_pk, seconds):
+    """Правит заметку в дочернем процессе; число сохранений."""
+    note = Note.objects.get(pk=note_pk)
+    writes = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        note.text = f'Правка {writes}'
+        note.save()
+        writes += 1
+    return writes
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность чтения списка заметок при '
+            'параллельной записи: с чтением из основной базы и с реплики.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=5,
+            help='Длительность каждого замера.',
+        )
+        parser.add_argument('--notes', type=int, default=100)
+
+    def _measure(self, name, user, note, options):
+        seconds = options['seconds']
+        # Дочерние процессы должны открыть собственные соединения.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['readers'] + 1) as pool:
+            writer = pool.submit(_write, note.pk, seconds)
+            readers = [
+                pool.submit(_read, user.pk, seconds)
+                for _ in range(options['readers'])
+            ]
+            timings = [
+                timing for reader in readers for timing in reader.result()
+            ]
+            writes = writer.result()
+        quantiles = statistics.quantiles(timings, n=20)
+        self.stdout.write(
+            f'{name:<10} чтений {len(timings) / seconds:8.1f}/с, '
+            f'p95 {quantiles[-1]:8.2f} мс, '
+            f'записей {writes / seconds:8.1f}/с'
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create(username='bench-replica')
+        try:
+            notes = Note.objects.bulk_create(
+                Note(title=f'Замер {number}', text='Текст заметки',
+                     slug=f'bench-replica-{number}', author=user)
+                for number in range(options['notes'])
+            )
+            for name, alias in (('основная', None), ('реплика', 'replica')):
+                with override_settings(
+                    NOTES_READ_REPLICA=alias, NOTES_RATE_LIMITS={}
+                ):
+                    self._measure(name, user, notes[0], options)
+        finally:
+            user.delete()
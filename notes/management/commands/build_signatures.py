@@ -0,0 +1,69 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from notes import minhash
+from notes.models import Note
+from notes.rendering import text_hash
+from notes.similarity import store_signatures
+
+
+def _sign_batch(batch):
+    """Считает сигнатуры пачки заметок в дочернем процессе."""
+    return [
+        (note_id, author_id, text_hash(text), minhash.signature(text))
+        for note_id, author_id, text in batch
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Строит MinHash-сигнатуры и LSH-индекс для существующих заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать сигнатуры и для уже проиндексированных заметок.',
+        )
+
+    def _batches(self, batch_size, rebuild):
+        """Пачки (id, author_id, text) с пагинацией по первичному ключу."""
+        notes = Note.objects.order_by('pk')
+        if not rebuild:
+            notes = notes.filter(signature__isnull=True)
+        last_pk = 0
+        while True:
+            batch = list(notes.filter(pk__gt=last_pk).values_list(
+                'pk', 'author_id', 'text'
+            )[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            yield batch
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or os.cpu_count() or 1
+        total = 0
+        # Ограничиваем число пачек в работе, чтобы не держать в памяти
+        # тексты всей базы: Executor.map отправил бы их разом.
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in self._batches(
+                options['batch_size'], options['rebuild']
+            ):
+                pending.append(pool.submit(_sign_batch, batch))
+                if len(pending) >= workers * 2:
+                    total += self._store(pending.popleft().result())
+            while pending:
+                total += self._store(pending.popleft().result())
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано заметок: {total}')
+        )
+
+    def _store(self, rows):
+        store_signatures(rows)
+        return len(rows)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from notes.changes import compact
+
+
+class Command(BaseCommand):
+    help = ('Сжимает журнал изменений: удаляет перекрытые записи '
+            'и устаревшие записи об удалении.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-days', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        superseded, tombstones = compact(
+            options['ttl_days'], options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено перекрытых записей: {superseded}, '
+            f'записей об удалении: {tombstones}'
+        ))
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from notes.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Сверяет статистику заметок пользователей с таблицей заметок '
+            'и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk').values_list(
+            'pk', flat=True
+        )
+        batch_size = options['batch_size']
+        drifted = []
+        last_pk = 0
+        while batch := list(users.filter(pk__gt=last_pk)[:batch_size]):
+            drifted += reconcile(batch, repair=not options['dry_run'])
+            last_pk = batch[-1]
+        verb = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} расхождений: {len(drifted)}'
+        ))
+        if drifted and options['verbosity'] > 1:
+            self.stdout.write(', '.join(map(str, drifted)))
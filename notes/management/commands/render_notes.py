@@ -0,0 +1,64 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+from notes.rendering import render, text_hash
+
+
+def _render_batch(batch):
+    """Отрисовывает пачку заметок в дочернем процессе."""
+    return [(pk, render(text), text_hash(text)) for pk, text in batch]
+
+
+class Command(BaseCommand):
+    help = 'Заранее отрисовывает Markdown существующих заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перерисовать и уже отрисованные заметки.',
+        )
+
+    def _batches(self, batch_size, everything):
+        """Пачки (id, text) с пагинацией по первичному ключу."""
+        notes = Note.objects.order_by('pk')
+        if not everything:
+            notes = notes.filter(text_hash='')
+        last_pk = 0
+        while True:
+            batch = list(notes.filter(pk__gt=last_pk).values_list(
+                'pk', 'text'
+            )[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            yield batch
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or os.cpu_count() or 1
+        total = 0
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in self._batches(options['batch_size'], options['all']):
+                pending.append(pool.submit(_render_batch, batch))
+                if len(pending) >= workers * 2:
+                    total += self._store(pending.popleft().result())
+            while pending:
+                total += self._store(pending.popleft().result())
+        self.stdout.write(
+            self.style.SUCCESS(f'Отрисовано заметок: {total}')
+        )
+
+    def _store(self, rows):
+        Note.objects.bulk_update(
+            [Note(pk=pk, text_html=html, text_hash=digest)
+             for pk, html, digest in rows],
+            ('text_html', 'text_hash'),
+        )
+        return len(rows)
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from notes.attachments import sweep_orphans
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы вложений, на которые больше нет ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes',
+            type=int,
+            default=60,
+            help='Не трогать содержимое, загруженное за это время.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        removed = sweep_orphans(
+            timedelta(minutes=options['grace_minutes']),
+            options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
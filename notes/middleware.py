@@ -0,0 +1,165 @@
+"""Ограничение частоты запросов, сброс нагрузки и выбор базы для чтения."""
+import math
+import threading
+import time
+from http import HTTPStatus
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .routers import read_from
+
+DEFAULT_RULE = '*'
+PIN_COOKIE = 'notes_primary'
+
+
+class AdmissionControlMiddleware:
+    """Пропускает запросы, пока воркер и пользователь не перегружены.
+
+    Число одновременно обрабатываемых запросов ограничено на процесс:
+    лишние сразу получают 503, а не ждут в очереди. Частота запросов
+    ограничивается корзиной токенов на пользователя (или IP для
+    анонимных) отдельно для каждого имени URL из NOTES_RATE_LIMITS.
+    Корзины хранятся в памяти процесса, в кеше NOTES_RATE_LIMIT_CACHE,
+    поэтому проверка лимита не пишет ни в базу, ни на диск. Лимиты
+    делятся поровну между NOTES_RATE_LIMIT_WORKERS процессами. Маршрут
+    со значением None в NOTES_RATE_LIMITS не ограничивается вовсе.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.max_concurrent = settings.NOTES_MAX_CONCURRENT_REQUESTS
+        self.rules = settings.NOTES_RATE_LIMITS
+        self.workers = settings.NOTES_RATE_LIMIT_WORKERS
+        self.cache = caches[settings.NOTES_RATE_LIMIT_CACHE]
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._enter():
+            return self._overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            self._leave()
+
+    async def __acall__(self, request):
+        if not self._enter():
+            return self._overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._leave()
+
+    def _enter(self):
+        with self._lock:
+            if self.max_concurrent and self._active >= self.max_concurrent:
+                return False
+            self._active += 1
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self._active -= 1
+
+    def _overloaded(self):
+        return self._reject(
+            HTTPStatus.SERVICE_UNAVAILABLE, 1, 'Сервер перегружен'
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.view_name
+        if name in self.rules:
+            rule = self.rules[name]
+        else:
+            name, rule = DEFAULT_RULE, self.rules.get(DEFAULT_RULE)
+        if rule is None or request.method not in rule.get(
+            'methods', (request.method,)
+        ):
+            return None
+        if request.user.is_authenticated:
+            client = f'user:{request.user.pk}'
+        else:
+            client = f'ip:{request.META.get("REMOTE_ADDR")}'
+        retry_after = self._take_token(
+            f'ratelimit:{name}:{client}',
+            rule['rate'] / self.workers,
+            max(1, rule['burst'] / self.workers),
+        )
+        if retry_after:
+            return self._reject(
+                HTTPStatus.TOO_MANY_REQUESTS, retry_after,
+                'Слишком много запросов'
+            )
+        return None
+
+    def _take_token(self, key, rate, burst):
+        """Списывает токен; возвращает 0 или время до следующего токена."""
+        now = time.time()
+        tokens, updated = self.cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return math.ceil((1 - tokens) / rate)
+        # Полная корзина ничем не отличается от отсутствующей, поэтому
+        # ключ живёт не дольше, чем корзина наполняется.
+        self.cache.set(key, (tokens - 1, now), math.ceil(burst / rate))
+        return 0
+
+    @staticmethod
+    def _reject(status, retry_after, message):
+        response = HttpResponse(message, status=status)
+        response['Retry-After'] = str(retry_after)
+        return response
+
+
+class ReadReplicaMiddleware:
+    """Отправляет чтения безопасных запросов на реплику NOTES_READ_REPLICA.
+
+    После изменяющего запроса клиент на NOTES_READ_REPLICA_PIN секунд
+    получает cookie, и все его запросы читают из основной базы: так он
+    сразу видит свои изменения, даже если реплика отстаёт.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.alias = settings.NOTES_READ_REPLICA
+        self.pin = settings.NOTES_READ_REPLICA_PIN
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with read_from(self._read_alias(request)):
+            response = self.get_response(request)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        with read_from(self._read_alias(request)):
+            response = await self.get_response(request)
+        return self._pin(request, response)
+
+    def _read_alias(self, request):
+        if request.method in ('GET', 'HEAD', 'OPTIONS') and (
+            PIN_COOKIE not in request.COOKIES
+        ):
+            return self.alias
+        return None
+
+    def _pin(self, request, response):
+        if self.alias and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.pin,
+                httponly=True, samesite='Lax',
+            )
+        return response
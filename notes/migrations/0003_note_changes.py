@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('notes', '0002_note_similarity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogHorizon',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('note_id', models.BigIntegerField()),
+                ('slug', models.SlugField(max_length=100)),
+                ('op', models.CharField(choices=[('upsert', 'Создание или изменение'), ('delete', 'Удаление')], max_length=6)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['author', 'seq'], name='notes_notec_author__29a85f_idx'), models.Index(fields=['note_id', 'seq'], name='notes_notec_note_id_497855_idx')],
+            },
+        ),
+    ]
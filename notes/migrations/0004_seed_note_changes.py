@@ -0,0 +1,28 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def seed_changes(apps, schema_editor):
+    """Заводит записи журнала для заметок, созданных до его появления."""
+    Note = apps.get_model('notes', 'Note')
+    NoteChange = apps.get_model('notes', 'NoteChange')
+    notes = Note.objects.order_by('pk').values_list('pk', 'author_id', 'slug')
+    last_pk = 0
+    while batch := list(notes.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+        NoteChange.objects.bulk_create(
+            NoteChange(note_id=pk, author_id=author_id, slug=slug, op='upsert')
+            for pk, author_id, slug in batch
+        )
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
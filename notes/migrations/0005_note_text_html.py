@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_seed_note_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='text_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_text_html'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=20)),
+                ('title', models.CharField(blank=True, max_length=100)),
+                ('text', models.TextField(blank=True)),
+                ('slug', models.CharField(blank=True, max_length=100)),
+                ('updated', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('note', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='drafts', to='notes.note')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('author', 'key'), name='unique_draft_per_form')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_attachments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Название')),
+                ('note_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='notes.note')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='notes.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='notes', through='notes.NoteTag', to='notes.tag', verbose_name='Теги'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('author', 'name'), name='unique_tag_per_author'),
+        ),
+        migrations.AddIndex(
+            model_name='notetag',
+            index=models.Index(fields=['note', 'tag'], name='notes_notet_note_id_aa9890_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notetag',
+            constraint=models.UniqueConstraint(fields=('tag', 'note'), name='unique_note_tag'),
+        ),
+    ]
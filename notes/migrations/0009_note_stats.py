@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('notes', '0008_note_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='note_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('note_count', models.PositiveIntegerField(default=0)),
+                ('text_size', models.PositiveBigIntegerField(default=0)),
+                ('last_edited', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0010_rate_limit_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notesignature',
+            name='text_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
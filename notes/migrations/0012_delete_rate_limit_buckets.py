@@ -0,0 +1,16 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0011_signature_text_hash'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='RateLimitBucket',
+        ),
+    ]
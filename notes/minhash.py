@@ -0,0 +1,78 @@
+"""MinHash-сигнатуры текста и LSH-бакеты для поиска похожих заметок.
+
+Модуль не зависит от Django, поэтому его функции можно выполнять
+в дочерних процессах без настройки окружения.
+"""
+import hashlib
+import random
+from array import array
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Коэффициенты хеш-функций фиксированы: сигнатуры, посчитанные
+# в разных процессах и в разное время, должны совпадать.
+_rng = random.Random(2603)
+_PERMUTATIONS = tuple(
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERM)
+)
+del _rng
+
+
+def _hash64(value):
+    """Стабильный 64-битный хеш строки."""
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def shingles(text):
+    """Множество словесных шинглов нормализованного текста."""
+    words = text.lower().split()
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {
+        ' '.join(words[i:i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(text):
+    """MinHash-сигнатура текста, упакованная в байты."""
+    hashes = [_hash64(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return array('I', [_MAX_HASH] * NUM_PERM).tobytes()
+    return array('I', (
+        min((a * x + b) % _PRIME for x in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )).tobytes()
+
+
+def bands(packed):
+    """Хеши LSH-полос сигнатуры в виде пар (номер полосы, бакет)."""
+    width = len(packed) // BANDS
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(
+                packed[band * width:(band + 1) * width], digest_size=8
+            ).digest(),
+            'little',
+            signed=True,
+        ))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по двум сигнатурам."""
+    first, second = array('I', bytes(first)), array('I', bytes(second))
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def is_empty(packed):
+    """Сигнатура пустого текста не участвует в поиске дубликатов."""
+    return all(value == _MAX_HASH for value in array('I', bytes(packed)))
@@ -1,8 +1,58 @@
+from collections import Counter
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.utils.safestring import mark_safe
 
 from pytils.translit import slugify
 
+from .rendering import render, text_hash
+
+
+class NoteQuerySet(models.QuerySet):
+    """Массовые операции, которые не пропускают статистику авторов.
+
+    Сигналы сохранения и удаления при них не отправляются, поэтому
+    статистика сдвигается здесь же, в одной транзакции с изменением.
+    """
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False,
+                    update_conflicts=False, **kwargs):
+        from .stats import apply_delta, reconcile
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(
+                objs, batch_size, ignore_conflicts, update_conflicts,
+                **kwargs
+            )
+            if ignore_conflicts or update_conflicts:
+                # Неизвестно, какие строки вставлены, а какие нет.
+                reconcile({note.author_id for note in objs})
+                return created
+            counts, sizes = Counter(), Counter()
+            for note in objs:
+                counts[note.author_id] += 1
+                sizes[note.author_id] += len(note.text)
+            for author_id, count in counts.items():
+                apply_delta(author_id, notes=count, size=sizes[author_id])
+        return created
+
+    def update(self, **kwargs):
+        if not {'text', 'author', 'author_id'} & kwargs.keys():
+            return super().update(**kwargs)
+        from .stats import apply_sizes, sizes_by_author
+
+        with transaction.atomic(using=self.db):
+            # После обновления фильтр может не найти те же строки.
+            notes = self.model.objects.filter(
+                pk__in=list(self.values_list('pk', flat=True))
+            )
+            before = sizes_by_author(notes)
+            updated = super().update(**kwargs)
+            apply_sizes(before, sizes_by_author(notes))
+        return updated
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -27,12 +77,261 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    text_html = models.TextField(editable=False, blank=True, default='')
+    text_hash = models.CharField(
+        max_length=64, editable=False, blank=True, default=''
+    )
+    tags = models.ManyToManyField(
+        'Tag',
+        through='NoteTag',
+        related_name='notes',
+        blank=True,
+        verbose_name='Теги',
+    )
+
+    objects = NoteQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        note = super().from_db(db, field_names, values)
+        # Длина текста на момент загрузки нужна для обновления статистики.
+        if 'text' in field_names:
+            note.saved_text_size = len(note.text)
+        return note
+
     def save(self, *args, **kwargs):
         if not self.slug:
             max_slug_length = self._meta.get_field('slug').max_length
             self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if self.refresh_html() and update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields, 'text_html', 'text_hash'
+            }
+        # Журнал, сигнатура и статистика обновляются обработчиками
+        # post_save и должны зафиксироваться вместе с заметкой.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def refresh_html(self):
+        """Перестраивает HTML, если текст изменился с прошлой отрисовки."""
+        digest = text_hash(self.text)
+        if digest == self.text_hash:
+            return False
+        self.text_html = render(self.text)
+        self.text_hash = digest
+        return True
+
+    @property
+    def html(self):
+        """HTML текста; устаревший перестраивается при первом чтении."""
+        if self.refresh_html() and self.pk:
+            Note.objects.filter(pk=self.pk, text=self.text).update(
+                text_html=self.text_html, text_hash=self.text_hash
+            )
+        return mark_safe(self.text_html)
+
+
+class NoteSignature(models.Model):
+    """MinHash-сигнатура текста заметки."""
+    note = models.OneToOneField(
+        Note,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+    )
+    minhash = models.BinaryField()
+    # Хеш текста, по которому посчитана сигнатура: пока он совпадает
+    # с хешем текущего текста, сигнатуру не нужно пересчитывать.
+    text_hash = models.CharField(max_length=64, blank=True, default='')
+
+
+class NoteBand(models.Model):
+    """Запись LSH-индекса: полоса сигнатуры и её бакет."""
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='bands',
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('author', 'band', 'bucket')),
+        ]
+
+
+class NoteChange(models.Model):
+    """Запись журнала изменений для инкрементальной синхронизации.
+
+    Ссылка на заметку хранится числом, чтобы запись об удалении
+    (tombstone) пережила саму заметку.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OPERATIONS = (
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    seq = models.BigAutoField(primary_key=True)
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='note_changes',
+    )
+    note_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=100)
+    op = models.CharField(max_length=6, choices=OPERATIONS)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('author', 'seq')),
+            models.Index(fields=('note_id', 'seq')),
+        ]
+
+
+class ChangeLogHorizon(models.Model):
+    """Последний номер изменения, удалённого при сжатии журнала.
+
+    Клиент с курсором меньше горизонта мог пропустить удаление
+    и должен синхронизироваться заново.
+    """
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    seq = models.BigIntegerField(default=0)
+
+
+class NoteDraft(models.Model):
+    """Черновик формы заметки, сохраняемый автоматически.
+
+    key - 'new' для новой заметки или id редактируемой заметки.
+    """
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(max_length=20)
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='drafts',
+    )
+    title = models.CharField(max_length=100, blank=True)
+    text = models.TextField(blank=True)
+    slug = models.CharField(max_length=100, blank=True)
+    updated = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('author', 'key'), name='unique_draft_per_form'
+            ),
+        ]
+
+
+class Blob(models.Model):
+    """Содержимое вложения, адресуемое по SHA-256.
+
+    Одинаковые файлы хранятся на диске один раз. touched обновляется
+    при каждой загрузке, чтобы очистка не удалила файл, на который
+    вот-вот сошлётся новое вложение.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    touched = models.DateTimeField(db_index=True)
+
+
+class Attachment(models.Model):
+    """Файл, прикреплённый к заметке."""
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='attachments',
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        related_name='attachments',
+    )
+    name = models.CharField('Имя файла', max_length=255)
+    content_type = models.CharField(max_length=100)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    """Тег автора.
+
+    note_count поддерживается при изменении связей с заметками,
+    чтобы список тегов не требовал агрегирующих запросов.
+    """
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    name = models.CharField('Название', max_length=50)
+    note_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('author', 'name'), name='unique_tag_per_author'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTag(models.Model):
+    """Связь заметки с тегом."""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('tag', 'note'), name='unique_note_tag'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=('note', 'tag')),
+        ]
+
+
+class NoteStats(models.Model):
+    """Сводка по заметкам пользователя.
+
+    Обновляется при каждом сохранении и удалении заметки, поэтому
+    для показа статистики достаточно чтения одной строки.
+    """
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='note_stats',
+    )
+    note_count = models.PositiveIntegerField(default=0)
+    text_size = models.PositiveBigIntegerField(default=0)
+    last_edited = models.DateTimeField(null=True, blank=True)
@@ -2,12 +2,20 @@
 import pytest
 
 # Импортируем класс клиента.
+from django.conf import settings
+from django.core.cache import caches
 from django.test.client import Client
 
 # Импортируем модель заметки, чтобы создать экземпляр.
 from notes.models import Note
 
 
+@pytest.fixture(autouse=True)
+def clear_rate_limits():
+    # Корзины токенов живут в памяти процесса и переживают отдельный тест.
+    caches[settings.NOTES_RATE_LIMIT_CACHE].clear()
+
+
 @pytest.fixture
 # Используем встроенную фикстуру для модели пользователей django_user_model.
 def author(django_user_model):
@@ -0,0 +1,147 @@
+"""Тесты вложений к заметкам."""
+import hashlib
+from http import HTTPStatus
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.attachments import blob_path
+from notes.models import Attachment, Blob
+
+CONTENT = b'0123456789'
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def blob_root(settings, tmp_path):
+    settings.NOTES_BLOB_ROOT = tmp_path
+
+
+@pytest.fixture
+def upload(author_client, note, django_capture_on_commit_callbacks):
+    def upload(content_type='text/plain'):
+        with django_capture_on_commit_callbacks(execute=True):
+            return author_client.post(
+                reverse('notes:attachment_upload', args=(note.slug,)),
+                {'file': SimpleUploadedFile(
+                    'file.txt', CONTENT, content_type
+                )},
+            )
+    return upload
+
+
+@pytest.fixture
+def attachment_url(upload):
+    upload()
+    return reverse('notes:attachment', args=(Attachment.objects.get().pk,))
+
+
+def test_upload_is_deduplicated(upload, note):
+    """Одинаковое содержимое хранится на диске один раз."""
+    upload()
+    response = upload()
+    assert response.status_code == HTTPStatus.FOUND
+    assert note.attachments.count() == 2
+    assert list(Blob.objects.values_list('sha256', flat=True)) == [SHA256]
+    assert blob_path(SHA256).read_bytes() == CONTENT
+
+
+def test_download(author_client, attachment_url):
+    """Вложение скачивается целиком с ETag."""
+    response = author_client.get(attachment_url)
+    assert response.status_code == HTTPStatus.OK
+    assert b''.join(response.streaming_content) == CONTENT
+    assert response['ETag'] == f'"{SHA256}"'
+    assert response['Accept-Ranges'] == 'bytes'
+
+
+@pytest.mark.parametrize(
+    'byte_range, content, content_range',
+    (
+        ('bytes=2-4', CONTENT[2:5], 'bytes 2-4/10'),
+        ('bytes=7-', CONTENT[7:], 'bytes 7-9/10'),
+        ('bytes=-3', CONTENT[-3:], 'bytes 7-9/10'),
+    ),
+)
+def test_range_download(author_client, attachment_url,
+                        byte_range, content, content_range):
+    """По заголовку Range отдаётся только запрошенный диапазон."""
+    response = author_client.get(attachment_url, headers={'Range': byte_range})
+    assert response.status_code == HTTPStatus.PARTIAL_CONTENT
+    assert b''.join(response.streaming_content) == content
+    assert response['Content-Range'] == content_range
+    assert response['Content-Length'] == str(len(content))
+
+
+def test_unsatisfiable_range(author_client, attachment_url):
+    """Диапазон за пределами файла отклоняется с 416."""
+    response = author_client.get(
+        attachment_url, headers={'Range': 'bytes=20-'}
+    )
+    assert response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response['Content-Range'] == 'bytes */10'
+
+
+def test_not_modified(author_client, attachment_url):
+    """Клиент с актуальной копией получает 304."""
+    response = author_client.get(
+        attachment_url, headers={'If-None-Match': f'"{SHA256}"'}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_other_user_cant_download(not_author_client, attachment_url):
+    """Чужое вложение недоступно."""
+    response = not_author_client.get(attachment_url)
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_orphaned_blobs_are_swept(upload, note):
+    """После удаления заметки очистка удаляет её файлы."""
+    upload()
+    note.delete()
+    call_command('sweep_blobs', grace_minutes=0)
+    assert not Blob.objects.exists()
+    assert not blob_path(SHA256).exists()
+
+
+def test_html_is_downloaded(author_client, upload):
+    """Загруженный HTML не открывается в браузере как страница сайта."""
+    upload('text/html')
+    response = author_client.get(
+        reverse('notes:attachment', args=(Attachment.objects.get().pk,))
+    )
+    assert response['Content-Disposition'].startswith('attachment')
+    assert response['X-Content-Type-Options'] == 'nosniff'
+
+
+def test_failed_upload_leaves_no_blob(author_client, note, monkeypatch,
+                                      tmp_path):
+    """При откате загрузки файл не попадает в хранилище."""
+    def fail(*args, **kwargs):
+        raise ValidationError('Ошибка')
+
+    monkeypatch.setattr(Attachment.objects, 'create', fail)
+    with pytest.raises(ValidationError):
+        author_client.post(
+            reverse('notes:attachment_upload', args=(note.slug,)),
+            {'file': SimpleUploadedFile('file.txt', CONTENT)},
+        )
+    assert not blob_path(SHA256).exists()
+    call_command('sweep_blobs', grace_minutes=0)
+    assert not any((tmp_path / 'tmp').iterdir())
+
+
+def test_sweep_walks_all_batches(upload, note):
+    """Очистка проходит все пачки сирот, а не только первую."""
+    upload()
+    Blob.objects.bulk_create(
+        Blob(sha256=char * 64, size=1, touched=timezone.now())
+        for char in 'abc'
+    )
+    call_command('sweep_blobs', grace_minutes=0, batch_size=1)
+    assert list(Blob.objects.values_list('sha256', flat=True)) == [SHA256]
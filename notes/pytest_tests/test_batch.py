@@ -0,0 +1,133 @@
+"""Тесты пакетного удаления и правки заметок."""
+import json
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+from pytest_django.asserts import assertRedirects
+
+from notes.models import Note, NoteChange, NoteStats, Tag
+from notes.tags import set_tags
+
+BATCH_URL = reverse('notes:batch')
+LIST_URL = reverse('notes:list')
+
+
+@pytest.fixture
+def notes(author):
+    notes = []
+    for number in range(3):
+        note = Note.objects.create(
+            title=f'Заметка {number}', text='x' * (number + 1),
+            slug=f'note-{number}', author=author,
+        )
+        set_tags(note, ['общий'])
+        notes.append(note)
+    return notes
+
+
+def post_json(client, payload):
+    return client.post(
+        BATCH_URL, json.dumps(payload), content_type='application/json'
+    )
+
+
+def test_batch_delete(author_client, author, notes):
+    """Удаление пачки обновляет журнал, статистику и счётчики тегов."""
+    response = post_json(author_client, {
+        'action': 'delete', 'notes': ['note-0', notes[1].pk, 'missing'],
+    })
+    assert [item['status'] for item in response.json()['results']] == [
+        'deleted', 'deleted', 'not_found'
+    ]
+    assert list(Note.objects.values_list('slug', flat=True)) == ['note-2']
+    stats = NoteStats.objects.get(author=author)
+    assert (stats.note_count, stats.text_size) == (1, 3)
+    assert Tag.objects.get(name='общий').note_count == 1
+    assert NoteChange.objects.filter(op=NoteChange.DELETE).count() == 2
+
+
+def test_batch_delete_rebuilds_missing_stats(author_client, author, notes):
+    """Пересобранная статистика не учитывает удалённые заметки."""
+    NoteStats.objects.all().delete()
+    post_json(author_client, {
+        'action': 'delete', 'notes': ['note-0', 'note-1'],
+    })
+    stats = NoteStats.objects.get(author=author)
+    assert (stats.note_count, stats.text_size) == (1, 3)
+
+
+def test_other_authors_notes_are_not_found(not_author_client, notes):
+    """Чужие заметки нельзя ни удалить, ни изменить."""
+    response = post_json(not_author_client, {
+        'action': 'delete', 'notes': ['note-0'],
+    })
+    assert response.json()['results'][0]['status'] == 'not_found'
+    response = post_json(not_author_client, {
+        'action': 'update', 'notes': [{'note': 'note-1', 'title': 'Чужая'}],
+    })
+    assert response.json()['results'][0]['status'] == 'not_found'
+    assert Note.objects.count() == 3
+
+
+def test_batch_update_checks_slugs(author_client, notes):
+    """Занятые и повторяющиеся в пачке slug отклоняются поштучно."""
+    response = post_json(author_client, {'action': 'update', 'notes': [
+        {'note': 'note-0', 'slug': 'note-2'},
+        {'note': 'note-1', 'title': 'Новое', 'slug': ''},
+        {'note': 'note-2', 'slug': 'bad slug'},
+    ]})
+    results = response.json()['results']
+    assert [item['status'] for item in results] == [
+        'invalid', 'updated', 'invalid'
+    ]
+    assert 'slug' in results[0]['errors']
+    assert results[1]['slug'] == 'novoe'
+    assert Note.objects.get(pk=notes[1].pk).title == 'Новое'
+    assert Note.objects.get(pk=notes[0].pk).slug == 'note-0'
+
+
+def test_batch_update_rejects_duplicates(author_client, notes):
+    """Одна заметка в пачке правок указывается не больше одного раза."""
+    response = post_json(author_client, {'action': 'update', 'notes': [
+        {'note': 'note-0', 'slug': 'one'},
+        {'note': notes[0].pk, 'slug': 'two'},
+    ]})
+    assert {item['status'] for item in response.json()['results']} == {
+        'invalid'
+    }
+
+
+def test_batch_from_list_form(author_client, notes):
+    """Форма списка переименовывает выбранные заметки и сообщает итог."""
+    response = author_client.post(BATCH_URL, {
+        'action': 'update', 'note': ['note-0', 'note-1'], 'title': 'Итог',
+    }, follow=True)
+    assertRedirects(response, LIST_URL)
+    assert list(Note.objects.filter(title='Итог').values_list(
+        'slug', flat=True
+    ).order_by('slug')) == ['note-0', 'note-1']
+    assert 'Изменено заметок: 2' in response.content.decode()
+
+
+def test_list_form_shows_errors(author_client, notes):
+    """Ошибки отдельных заметок показываются в списке."""
+    response = author_client.post(BATCH_URL, {
+        'action': 'update', 'note': ['note-0', 'missing'], 'title': '',
+    }, follow=True)
+    content = response.content.decode()
+    assert 'note-0: Обязательное поле.' in content
+    assert 'missing: заметка не найдена' in content
+    assert Note.objects.get(slug='note-0').title == 'Заметка 0'
+
+
+@pytest.mark.parametrize('payload', (
+    {'action': 'archive', 'notes': []},
+    {'action': 'delete', 'notes': 'note-0'},
+    {'action': 'delete', 'notes': ['x'] * 501},
+    {'action': 'update', 'notes': ['note-0']},
+))
+def test_bad_batch_requests(author_client, notes, payload):
+    """Неверные пакетные запросы отклоняются целиком."""
+    response = post_json(author_client, payload)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,88 @@
+"""Тесты журнала изменений и эндпоинта синхронизации."""
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.models import Note, NoteChange
+
+CHANGES_URL = reverse('notes:changes')
+
+
+def test_changes_since_cursor(author_client, note):
+    """Клиент получает только изменения после своего курсора."""
+    cursor = author_client.get(CHANGES_URL).json()['cursor']
+    note.title = 'Новый заголовок'
+    note.save()
+    data = author_client.get(CHANGES_URL, {'since': cursor}).json()
+    assert [change['title'] for change in data['changes']] == [note.title]
+    assert data['cursor'] > cursor
+    assert data['has_more'] is False
+
+
+def test_delete_leaves_tombstone(author_client, note):
+    """Удаление заметки видно клиенту как tombstone."""
+    cursor = author_client.get(CHANGES_URL).json()['cursor']
+    author_client.post(reverse('notes:delete', args=(note.slug,)))
+    changes = author_client.get(
+        CHANGES_URL, {'since': cursor}
+    ).json()['changes']
+    assert changes == [{
+        'seq': changes[0]['seq'],
+        'op': NoteChange.DELETE,
+        'id': note.id,
+        'slug': note.slug,
+    }]
+
+
+def test_changes_are_batched(author_client, author):
+    """Изменения отдаются пачками ограниченного размера."""
+    for number in range(3):
+        Note.objects.create(title=f'Заметка {number}', author=author)
+    data = author_client.get(CHANGES_URL, {'limit': 2}).json()
+    assert len(data['changes']) == 2
+    assert data['has_more'] is True
+    data = author_client.get(
+        CHANGES_URL, {'since': data['cursor'], 'limit': 2}
+    ).json()
+    assert len(data['changes']) == 1
+    assert data['has_more'] is False
+
+
+def test_other_users_changes_are_hidden(not_author_client, note):
+    """Пользователь не видит изменений чужих заметок."""
+    assert not_author_client.get(CHANGES_URL).json()['changes'] == []
+
+
+@pytest.mark.parametrize('since', ('abc', '1.5'))
+def test_invalid_cursor(author_client, since):
+    """Некорректный курсор отклоняется."""
+    response = author_client.get(CHANGES_URL, {'since': since})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_compaction(author_client, note):
+    """Сжатие оставляет последнюю запись по заметке и сдвигает горизонт."""
+    note.save()
+    note.save()
+    call_command('compact_changes')
+    assert NoteChange.objects.filter(note_id=note.id).count() == 1
+
+    cursor = author_client.get(CHANGES_URL).json()['cursor']
+    note.delete()
+    NoteChange.objects.update(created=timezone.now() - timedelta(days=365))
+    call_command('compact_changes')
+    assert not NoteChange.objects.exists()
+    response = author_client.get(CHANGES_URL, {'since': cursor})
+    assert response.status_code == HTTPStatus.GONE
+
+
+def test_create_is_logged_once(author_client, form_data):
+    """Создание заметки через форму пишет в журнал одну запись."""
+    author_client.post(reverse('notes:add'), form_data)
+    assert list(NoteChange.objects.values_list('slug', 'op')) == [
+        (form_data['slug'], NoteChange.UPSERT)
+    ]
@@ -0,0 +1,108 @@
+"""Тесты автосохранения черновиков."""
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+from pytest_django.asserts import assertRedirects
+
+from notes.drafts import NEW, DraftBuffer, buffer
+from notes.models import Note, NoteDraft
+
+
+@pytest.fixture
+def draft_buffer():
+    return DraftBuffer(interval=0, max_pending=100)
+
+
+@pytest.fixture
+def manual_flush(settings):
+    """Глобальный буфер сбрасывается только явным вызовом flush."""
+    settings.NOTES_DRAFTS_FLUSH_INTERVAL = 0
+
+
+def test_updates_are_coalesced(author, draft_buffer,
+                               django_assert_num_queries):
+    """Много автосохранений одного черновика дают одну запись."""
+    for length in range(1, 51):
+        draft_buffer.add(author.pk, NEW, None, {'text': 'а' * length})
+    with django_assert_num_queries(3):
+        assert draft_buffer.flush() == 1
+    assert NoteDraft.objects.get(author=author, key=NEW).text == 'а' * 50
+
+
+def test_partial_updates_keep_other_fields(author, draft_buffer):
+    """Частичное обновление не затирает остальные поля черновика."""
+    draft_buffer.add(author.pk, NEW, None, {'title': 'Заголовок'})
+    draft_buffer.flush()
+    draft_buffer.add(author.pk, NEW, None, {'text': 'Текст'})
+    draft_buffer.flush()
+    draft = NoteDraft.objects.get(author=author, key=NEW)
+    assert (draft.title, draft.text) == ('Заголовок', 'Текст')
+
+
+def test_buffer_flushes_at_size_threshold(author, note):
+    """Заполненный буфер сбрасывается, не дожидаясь таймера."""
+    draft_buffer = DraftBuffer(interval=0, max_pending=2)
+    draft_buffer.add(author.pk, NEW, None, {'text': 'Новая'})
+    assert not NoteDraft.objects.exists()
+    draft_buffer.add(author.pk, str(note.pk), note.pk, {'text': 'Правка'})
+    assert NoteDraft.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_note_drafts_are_dropped(author, not_author, note,
+                                         manual_flush):
+    """Черновики удалённой заметки не мешают сбросу остальных."""
+    buffer.add(author.pk, str(note.pk), note.pk, {'text': 'Правка'})
+    buffer.add(not_author.pk, NEW, None, {'text': 'Новая'})
+    note.delete()
+    assert buffer.flush() == 1
+    assert NoteDraft.objects.get().author == not_author
+
+
+@pytest.mark.django_db(transaction=True)
+def test_broken_drafts_are_not_requeued(author, note, draft_buffer):
+    """Черновик, который нельзя записать, не остаётся в буфере."""
+    draft_buffer.add(author.pk, str(note.pk), note.pk, {'text': 'Правка'})
+    draft_buffer.add(author.pk + 100, NEW, None, {'text': 'Ничья'})
+    draft_buffer.add(author.pk, NEW, None, {'text': 'Новая'})
+    Note.objects.filter(pk=note.pk).delete()
+    draft_buffer.flush()
+    assert NoteDraft.objects.get().text == 'Новая'
+    assert draft_buffer.flush() == 0
+
+
+def test_draft_is_restored_and_promoted(
+    author_client, author, form_data, manual_flush,
+    django_capture_on_commit_callbacks,
+):
+    """Черновик подставляется в форму и удаляется после сохранения."""
+    response = author_client.post(reverse('notes:draft'), form_data)
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert not NoteDraft.objects.exists()
+    buffer.flush()
+    assert NoteDraft.objects.filter(author=author, key=NEW).exists()
+
+    response = author_client.get(reverse('notes:add'))
+    assert response.context['form'].initial['text'] == form_data['text']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(reverse('notes:add'), form_data)
+    assertRedirects(response, reverse('notes:success'))
+    assert Note.objects.filter(slug=form_data['slug']).exists()
+    assert not NoteDraft.objects.exists()
+
+
+def test_other_user_cant_save_draft(not_author_client, note, manual_flush):
+    """Нельзя сохранить черновик чужой заметки."""
+    url = reverse('notes:draft', args=(note.slug,))
+    response = not_author_client.post(url, {'text': 'Чужой текст'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_oversized_draft_is_rejected(author_client, settings, manual_flush):
+    """Слишком большой черновик не попадает в буфер."""
+    settings.NOTES_DRAFTS_MAX_SIZE = 10
+    response = author_client.post(reverse('notes:draft'), {'text': 'а' * 11})
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert buffer.flush() == 0
@@ -0,0 +1,75 @@
+"""Тесты рассылки событий об изменениях заметок."""
+import asyncio
+import threading
+from http import HTTPStatus
+
+from asgiref.sync import async_to_sync
+from django.test.client import AsyncClient
+from django.urls import reverse
+from pytest_django.asserts import assertRedirects
+
+from notes.events import OVERFLOW, Broker
+
+EVENTS_URL = reverse('notes:events')
+
+
+def test_publish_from_other_thread():
+    """Событие из синхронного потока доходит до подписчика в loop."""
+    async def receive():
+        broker = Broker()
+        subscription = broker.subscribe(1)
+        thread = threading.Thread(
+            target=broker.publish, args=(1, {'seq': 1})
+        )
+        thread.start()
+        thread.join()
+        event = await subscription.get(timeout=1)
+        broker.unsubscribe(subscription)
+        return event
+
+    assert asyncio.run(receive()) == {'seq': 1}
+
+
+def test_slow_subscriber_overflows():
+    """Переполненная очередь заменяется маркером отключения."""
+    async def overflow():
+        broker = Broker(queue_size=2)
+        subscription = broker.subscribe(1)
+        for seq in range(3):
+            broker.publish(1, {'seq': seq})
+        await asyncio.sleep(0)
+        return await subscription.get(timeout=1)
+
+    assert asyncio.run(overflow()) is OVERFLOW
+
+
+def test_anonymous_user_is_redirected(client):
+    """Анонимный пользователь перенаправляется на страницу логина."""
+    login_url = reverse('users:login')
+    response = client.get(EVENTS_URL)
+    assertRedirects(response, f'{login_url}?next={EVENTS_URL}')
+
+
+def test_stream_replays_from_last_event_id(author, note):
+    """После переподключения поток отдаёт изменения из журнала."""
+    async def first_event():
+        client = AsyncClient()
+        await client.aforce_login(author)
+        response = await client.get(
+            EVENTS_URL, headers={'Last-Event-ID': '0'}
+        )
+        stream = aiter(response.streaming_content)
+        chunk = await anext(stream)
+        await stream.aclose()
+        return response['Content-Type'], chunk
+
+    content_type, chunk = async_to_sync(first_event)()
+    assert content_type == 'text/event-stream'
+    assert b'event: upsert' in chunk
+    assert note.slug.encode() in chunk
+
+
+def test_stream_requires_asgi(author_client):
+    """Под WSGI поток не открывается, чтобы не занять воркер навсегда."""
+    response = author_client.get(EVENTS_URL)
+    assert response.status_code == HTTPStatus.NOT_IMPLEMENTED
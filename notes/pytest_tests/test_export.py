@@ -0,0 +1,56 @@
+"""Тесты выгрузки заметок в ZIP-архив."""
+import io
+import zipfile
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from notes.export import export_archive
+from notes.models import Note
+
+EXPORT_URL = reverse('notes:export')
+
+
+@pytest.fixture
+def notes(author, not_author):
+    Note.objects.create(title='Чужая', slug='other', author=not_author)
+    return [
+        Note.objects.create(
+            title=f'Заметка {number}', text=f'Текст {number}',
+            slug=f'note-{number}', author=author,
+        )
+        for number in range(3)
+    ]
+
+
+def read_archive(response):
+    assert response.streaming
+    return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+
+def test_export_contains_author_notes(author_client, notes):
+    """В архиве по файлу на каждую заметку автора."""
+    response = author_client.get(EXPORT_URL)
+    assert response['Content-Type'] == 'application/zip'
+    archive = read_archive(response)
+    assert archive.namelist() == [f'{note.slug}.md' for note in notes]
+    assert archive.read('note-0.md').decode() == '# Заметка 0\n\nТекст 0\n'
+
+
+def test_export_is_streamed_in_batches(author, notes):
+    """Архив отдаётся частями по мере чтения пачек заметок."""
+    chunks = list(export_archive(author, batch_size=1))
+    assert len([chunk for chunk in chunks if chunk]) > len(notes)
+
+
+def test_export_can_be_resumed(author_client, notes):
+    """Параметр after продолжает выгрузку после указанной заметки."""
+    response = author_client.get(EXPORT_URL, {'after': notes[0].slug})
+    assert read_archive(response).namelist() == ['note-1.md', 'note-2.md']
+
+
+def test_resume_after_foreign_note(author_client, notes):
+    """Нельзя продолжить выгрузку после чужой заметки."""
+    response = author_client.get(EXPORT_URL, {'after': 'other'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
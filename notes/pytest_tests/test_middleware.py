@@ -0,0 +1,97 @@
+"""Тесты ограничения частоты запросов и сброса нагрузки."""
+from http import HTTPStatus
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from notes.middleware import AdmissionControlMiddleware
+
+LOGIN_RULE = {'rate': 1 / 60, 'burst': 2, 'methods': ('POST',)}
+
+pytestmark = pytest.mark.django_db
+
+
+def test_login_is_rate_limited(client, settings):
+    """Лишние попытки входа получают 429 с Retry-After."""
+    settings.NOTES_RATE_LIMITS = {'users:login': LOGIN_RULE}
+    url = reverse('users:login')
+    statuses = [client.post(url).status_code for _ in range(3)]
+    assert statuses == [HTTPStatus.OK, HTTPStatus.OK,
+                        HTTPStatus.TOO_MANY_REQUESTS]
+    response = client.post(url)
+    assert int(response['Retry-After']) > 0
+
+
+def test_limits_are_separate_per_route(client, settings):
+    """Исчерпанный лимит входа не мешает остальным страницам."""
+    settings.NOTES_RATE_LIMITS = {'users:login': LOGIN_RULE}
+    url = reverse('users:login')
+    for _ in range(3):
+        client.post(url)
+    assert client.get(url).status_code == HTTPStatus.OK
+    assert client.get(reverse('notes:home')).status_code == HTTPStatus.OK
+
+
+def test_overloaded_worker_sheds_requests(settings):
+    """Запрос сверх лимита одновременных получает 503."""
+    settings.NOTES_MAX_CONCURRENT_REQUESTS = 1
+    request = RequestFactory().get('/')
+
+    def get_response(request):
+        inner = middleware(request)
+        return HttpResponse(status=HTTPStatus.OK, headers={
+            'X-Inner-Status': inner.status_code,
+            'X-Retry-After': inner['Retry-After'],
+        })
+
+    middleware = AdmissionControlMiddleware(get_response)
+    response = middleware(request)
+    assert response.status_code == HTTPStatus.OK
+    assert response['X-Inner-Status'] == str(HTTPStatus.SERVICE_UNAVAILABLE)
+    assert response['X-Retry-After'] == '1'
+
+
+def test_reads_are_not_limited_by_default(client):
+    """Правило по умолчанию не тратит токены на чтение."""
+    for _ in range(3):
+        client.get(reverse('users:login'))
+    cache = caches[django_settings.NOTES_RATE_LIMIT_CACHE]
+    assert cache.get('ratelimit:*:ip:127.0.0.1') is None
+
+
+def test_route_can_opt_out(client, settings):
+    """Маршрут с правилом None не ограничивается правилом по умолчанию."""
+    settings.NOTES_RATE_LIMITS = {
+        'users:login': None, '*': {'rate': 1 / 60, 'burst': 1},
+    }
+    url = reverse('users:login')
+    for _ in range(3):
+        assert client.post(url).status_code == HTTPStatus.OK
+
+
+def test_limits_are_split_between_workers(client, settings):
+    """Каждый из воркеров получает свою долю лимита."""
+    settings.NOTES_RATE_LIMITS = {
+        'users:login': {'rate': 1 / 60, 'burst': 4, 'methods': ('POST',)},
+    }
+    settings.NOTES_RATE_LIMIT_WORKERS = 2
+    url = reverse('users:login')
+    statuses = [client.post(url).status_code for _ in range(3)]
+    assert statuses == [HTTPStatus.OK, HTTPStatus.OK,
+                        HTTPStatus.TOO_MANY_REQUESTS]
+
+
+def test_lockout_survives_other_clients(client, settings):
+    """Корзины новых клиентов не вытесняют исчерпанную корзину."""
+    settings.NOTES_RATE_LIMITS = {'users:login': LOGIN_RULE}
+    url = reverse('users:login')
+    for _ in range(2):
+        client.post(url)
+    for number in range(500):
+        client.post(url, REMOTE_ADDR=f'10.0.{number // 256}.{number % 256}')
+    response = client.post(url)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
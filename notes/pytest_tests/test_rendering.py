@@ -0,0 +1,39 @@
+"""Тесты отрисовки Markdown в тексте заметок."""
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes.models import Note
+from notes.rendering import render, text_hash
+
+
+def test_render_is_sanitized():
+    """Из HTML удаляются скрипты и обработчики событий."""
+    html = render('**жирный** <script>alert(1)</script>'
+                  '<a href="#" onclick="alert(1)">ссылка</a>')
+    assert '<strong>жирный</strong>' in html
+    assert '<script>' not in html
+    assert 'onclick' not in html
+
+
+def test_html_is_rendered_on_save(note):
+    """HTML и хеш текста сохраняются вместе с заметкой."""
+    note.refresh_from_db()
+    assert note.text_hash == text_hash(note.text)
+    assert note.text_html == render(note.text)
+
+
+def test_stale_html_is_rendered_on_read(author_client, note):
+    """Устаревший HTML перестраивается при первом открытии заметки."""
+    Note.objects.filter(pk=note.pk).update(text='# Новый текст')
+    response = author_client.get(reverse('notes:detail', args=(note.slug,)))
+    assert '<h1>Новый текст</h1>' in response.content.decode()
+    note.refresh_from_db()
+    assert note.text_hash == text_hash('# Новый текст')
+
+
+def test_render_notes_command(note):
+    """Команда отрисовывает заметки без HTML."""
+    Note.objects.update(text_html='', text_hash='')
+    call_command('render_notes', workers=1)
+    note.refresh_from_db()
+    assert note.text_html == render(note.text)
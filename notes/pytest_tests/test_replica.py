@@ -0,0 +1,64 @@
+"""Тесты разделения чтения и записи между базами."""
+import pytest
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.middleware import PIN_COOKIE, ReadReplicaMiddleware
+from notes.models import Note
+from notes.routers import ReplicaRouter, read_from
+
+
+def read_alias_view(request):
+    return HttpResponse(ReplicaRouter().db_for_read(Note))
+
+
+@pytest.fixture
+def middleware():
+    return ReadReplicaMiddleware(read_alias_view)
+
+
+def test_router():
+    """Чтения идут на реплику только внутри read_from, записи - в default."""
+    router = ReplicaRouter()
+    assert router.db_for_read(Note) == 'default'
+    with read_from('replica'):
+        assert router.db_for_read(Note) == 'replica'
+        assert router.db_for_write(Note) == 'default'
+    assert not router.allow_migrate('replica', 'notes')
+
+
+@pytest.mark.django_db
+def test_router_inside_transaction():
+    """В открытой транзакции чтения остаются в основной базе."""
+    with read_from('replica'):
+        assert ReplicaRouter().db_for_read(Note) == 'default'
+
+
+def test_writes_pin_reads_to_primary(middleware):
+    """После записи клиент читает из основной базы, пока есть cookie."""
+    factory = RequestFactory()
+    assert middleware(factory.get('/')).content == b'replica'
+    response = middleware(factory.post('/'))
+    assert response.content == b'default'
+    assert response.cookies[PIN_COOKIE]['max-age'] == 5
+    request = factory.get('/')
+    request.COOKIES[PIN_COOKIE] = '1'
+    assert middleware(request).content == b'default'
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_list_is_read_from_replica(author_client, note):
+    """Список заметок читается с реплики, а правка - через основную базу."""
+    with CaptureQueriesContext(connections['replica']) as replica:
+        response = author_client.get(reverse('notes:list'))
+    assert note in response.context['object_list']
+    assert replica.captured_queries
+    with CaptureQueriesContext(connections['replica']) as replica:
+        author_client.post(reverse('notes:edit', args=(note.slug,)), {
+            'title': 'Новый', 'text': note.text, 'slug': note.slug,
+        })
+        author_client.get(reverse('notes:list'))
+    assert not replica.captured_queries
@@ -0,0 +1,94 @@
+"""Тесты поиска похожих заметок."""
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes import minhash
+from notes.models import Note, NoteBand, NoteSignature
+
+TEXT = ('Купить молоко, хлеб, сыр и яйца в магазине у дома '
+        'после работы, не забыть про скидочную карту')
+
+
+def test_signature_is_stable_and_compact():
+    """Сигнатура детерминирована и занимает NUM_PERM * 4 байта."""
+    packed = minhash.signature(TEXT)
+    assert packed == minhash.signature(TEXT)
+    assert len(packed) == minhash.NUM_PERM * 4
+    assert minhash.similarity(packed, packed) == 1
+
+
+def test_signature_is_built_on_save(note):
+    """При сохранении заметки строятся сигнатура и полосы LSH."""
+    assert NoteSignature.objects.filter(note=note).exists()
+    assert NoteBand.objects.filter(note=note).count() == minhash.BANDS
+
+
+def test_detail_shows_similar_notes(author_client, author, not_author):
+    """На странице заметки выводятся похожие заметки того же автора."""
+    note = Note.objects.create(title='1', text=TEXT, author=author)
+    twin = Note.objects.create(
+        title='2', text=TEXT + ' вечером', author=author
+    )
+    Note.objects.create(title='3', text=TEXT, author=not_author)
+    Note.objects.create(title='4', text='Совсем другое', author=author)
+    response = author_client.get(reverse('notes:detail', args=(note.slug,)))
+    assert response.context['similar_notes'] == [twin]
+
+
+def test_duplicates_report(author_client, author):
+    """Отчёт о дубликатах содержит пары похожих заметок."""
+    first = Note.objects.create(title='1', text=TEXT, author=author)
+    second = Note.objects.create(title='2', text=TEXT, author=author)
+    response = author_client.get(reverse('notes:duplicates'))
+    assert response.context['duplicates'] == [(first, second, 1.0)]
+
+
+def test_build_signatures_command(note):
+    """Команда индексирует заметки без сигнатур."""
+    NoteSignature.objects.all().delete()
+    NoteBand.objects.all().delete()
+    call_command('build_signatures', workers=1)
+    assert NoteSignature.objects.filter(note=note).exists()
+    assert NoteBand.objects.filter(note=note).count() == minhash.BANDS
+
+
+def test_signature_is_kept_on_title_edit(note):
+    """Правка заголовка не пересчитывает сигнатуру."""
+    NoteSignature.objects.filter(note=note).update(minhash=b'')
+    note.title = 'Другой заголовок'
+    note.save()
+    assert bytes(NoteSignature.objects.get(note=note).minhash) == b''
+
+
+def test_identical_notes_are_grouped(author_client, author):
+    """Одинаковые заметки дают пары с первой заметкой группы."""
+    notes = [
+        Note.objects.create(title=str(number), text=TEXT, author=author)
+        for number in range(4)
+    ]
+    response = author_client.get(reverse('notes:duplicates'))
+    assert response.context['duplicates'] == [
+        (notes[0], other, 1.0) for other in notes[1:]
+    ]
+
+
+def test_create_signs_note_once(author_client, form_data):
+    """Создание заметки через форму считает сигнатуру один раз."""
+    with mock.patch(
+        'notes.similarity.minhash.signature', wraps=minhash.signature
+    ) as signature:
+        author_client.post(reverse('notes:add'), form_data)
+    assert signature.call_count == 1
+
+
+def test_signature_follows_text_changed_in_bulk(author_client, note):
+    """Сигнатура обновляется, даже если HTML уже перестроен при чтении."""
+    Note.objects.filter(pk=note.pk).update(text=TEXT)
+    author_client.get(reverse('notes:detail', args=(note.slug,)))
+    note = Note.objects.get(pk=note.pk)
+    note.save()
+    assert bytes(
+        NoteSignature.objects.get(note=note).minhash
+    ) == minhash.signature(TEXT)
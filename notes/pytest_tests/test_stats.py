@@ -0,0 +1,90 @@
+"""Тесты статистики заметок пользователя."""
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes.models import Note, NoteStats
+
+
+def stats_of(user):
+    stats = NoteStats.objects.get(author=user)
+    return stats.note_count, stats.text_size
+
+
+def test_stats_follow_note_changes(author, note):
+    """Статистика меняется при создании, правке и удалении заметок."""
+    assert stats_of(author) == (1, len(note.text))
+    note.text = 'Другой текст подлиннее'
+    note.save()
+    assert stats_of(author) == (1, len(note.text))
+    other = Note.objects.create(title='Вторая', text='abc', author=author)
+    assert stats_of(author) == (2, len(note.text) + 3)
+    Note.objects.filter(pk=other.pk).delete()
+    assert stats_of(author) == (1, len(note.text))
+    assert NoteStats.objects.get(author=author).last_edited is not None
+
+
+def test_stats_for_note_loaded_without_text(author, note):
+    """Правка заметки, загруженной без текста, учитывает прежнюю длину."""
+    partial = Note.objects.only('title').get(pk=note.pk)
+    partial.text = 'abc'
+    partial.save()
+    assert stats_of(author) == (1, 3)
+
+
+def test_stats_for_note_built_with_existing_pk(author, note):
+    """Заметка, собранная вручную по существующему pk, меняет размер."""
+    Note(
+        pk=note.pk, title=note.title, text='abc', slug=note.slug,
+        author=author,
+    ).save()
+    assert stats_of(author) == (1, 3)
+
+
+def test_stats_in_header(author_client, author, note):
+    """Шапка показывает статистику из одной строки таблицы."""
+    response = author_client.get(reverse('notes:home'))
+    assert 'заметок: 1' in response.content.decode()
+
+
+def test_reconcile_repairs_drift(author, note):
+    """Сверка находит и исправляет расхождение."""
+    NoteStats.objects.filter(author=author).update(note_count=5, text_size=1)
+    call_command('reconcile_stats', dry_run=True)
+    assert stats_of(author) == (5, 1)
+    call_command('reconcile_stats')
+    assert stats_of(author) == (1, len(note.text))
+
+
+def test_bulk_operations_update_stats(author, not_author, note):
+    """Массовые вставка и обновление тоже сдвигают статистику."""
+    Note.objects.bulk_create(
+        Note(title=str(number), text='abc', slug=f'bulk-{number}',
+             author=author)
+        for number in range(3)
+    )
+    assert stats_of(author) == (4, len(note.text) + 9)
+    Note.objects.filter(slug__startswith='bulk-').update(text='a')
+    assert stats_of(author) == (4, len(note.text) + 3)
+    Note.objects.filter(pk=note.pk).update(author=not_author)
+    assert stats_of(author) == (3, 3)
+    assert stats_of(not_author) == (1, len(note.text))
+
+
+def test_failed_stats_roll_back_note(author, note, monkeypatch):
+    """Заметка не сохраняется, если не удалось обновить статистику."""
+    def fail(*args, **kwargs):
+        raise RuntimeError
+
+    monkeypatch.setattr('notes.signals.apply_delta', fail)
+    note.text = 'Новый текст'
+    with pytest.raises(RuntimeError):
+        note.save()
+    assert Note.objects.get(pk=note.pk).text == 'Текст заметки'
+
+
+def test_missing_stats_are_rebuilt(author, note):
+    """Отсутствующая строка статистики строится по заметкам."""
+    NoteStats.objects.all().delete()
+    Note.objects.create(title='Вторая', text='abc', author=author)
+    assert stats_of(author) == (2, len(note.text) + 3)
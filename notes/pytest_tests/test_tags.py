@@ -0,0 +1,82 @@
+"""Тесты тегов заметок."""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note, Tag
+from notes.tags import set_tags
+
+LIST_URL = reverse('notes:list')
+API_URL = reverse('notes:api_list')
+
+
+@pytest.fixture
+def tagged_notes(author):
+    notes = {}
+    for slug, tags in (('work', ['работа']),
+                       ('work-urgent', ['работа', 'срочно']),
+                       ('home', ['дом'])):
+        notes[slug] = Note.objects.create(
+            title=slug, text=slug, slug=slug, author=author
+        )
+        set_tags(notes[slug], tags)
+    return notes
+
+
+def test_tags_are_saved_from_form(author_client, author, form_data):
+    """Теги из формы создаются и привязываются к заметке."""
+    form_data['tags'] = 'Работа, срочно, работа'
+    author_client.post(reverse('notes:add'), form_data)
+    note = Note.objects.get(slug=form_data['slug'])
+    assert sorted(note.tags.values_list('name', flat=True)) == [
+        'работа', 'срочно'
+    ]
+    assert set(Tag.objects.values_list('note_count', flat=True)) == {1}
+
+
+def test_counts_follow_changes(tagged_notes):
+    """Счётчики тегов меняются вместе со связями и удалением заметок."""
+    set_tags(tagged_notes['work-urgent'], ['срочно'])
+    assert Tag.objects.get(name='работа').note_count == 1
+    tagged_notes['work'].delete()
+    assert Tag.objects.get(name='работа').note_count == 0
+    assert Tag.objects.get(name='срочно').note_count == 1
+
+
+@pytest.mark.parametrize(
+    'params, expected',
+    (
+        ({'tag': ['работа']}, ['work', 'work-urgent']),
+        ({'tag': ['работа', 'срочно']}, ['work-urgent']),
+        ({'tag': ['работа', 'дом']}, []),
+        ({'tag': ['работа', 'дом'], 'match': 'any'},
+         ['work', 'work-urgent', 'home']),
+        ({'tag': ['нет такого']}, []),
+        ({'tag': [' Работа ', 'СРОЧНО']}, ['work-urgent']),
+    ),
+)
+def test_filter_by_tags(author_client, tagged_notes, params, expected):
+    """Список и JSON API фильтруются по всем или любому из тегов."""
+    response = author_client.get(LIST_URL, params)
+    assert [note.slug for note in response.context['object_list']] == expected
+    notes = author_client.get(API_URL, params).json()['notes']
+    assert [note['slug'] for note in notes] == expected
+
+
+def test_other_users_tags_are_ignored(not_author_client, tagged_notes):
+    """Чужие теги не открывают доступ к чужим заметкам."""
+    response = not_author_client.get(LIST_URL, {'tag': 'работа'})
+    assert list(response.context['object_list']) == []
+
+
+def test_list_tags_are_prefetched(author_client, author, tagged_notes):
+    """Число запросов списка не растёт с числом заметок."""
+    with CaptureQueriesContext(connection) as few:
+        author_client.get(LIST_URL)
+    for number in range(5):
+        note = Note.objects.create(title=f'Ещё {number}', author=author)
+        set_tags(note, ['работа'])
+    with CaptureQueriesContext(connection) as many:
+        author_client.get(LIST_URL)
+    assert len(many) == len(few)
@@ -0,0 +1,20 @@
+"""Преобразование текста заметки из Markdown в безопасный HTML."""
+import hashlib
+
+import markdown
+import nh3
+
+EXTENSIONS = ('fenced_code', 'tables', 'sane_lists')
+
+
+def text_hash(text):
+    """Хеш исходного текста, по которому проверяется актуальность HTML."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def render(text):
+    """HTML заметки, очищенный от скриптов и опасных атрибутов."""
+    return nh3.clean(
+        markdown.markdown(text, extensions=EXTENSIONS),
+        link_rel='noopener noreferrer nofollow',
+    )
@@ -0,0 +1,43 @@
+"""Разделение чтения и записи между основной базой и репликой."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_read_alias = ContextVar('notes_read_alias', default=None)
+
+
+@contextmanager
+def read_from(alias):
+    """Направляет чтения внутри блока на базу alias."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Чтения внутри read_from идут на реплику, остальное - в default.
+
+    Пока в основной базе открыта транзакция, чтения тоже идут в неё,
+    иначе транзакция не увидела бы собственных изменений.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Явный default: иначе Django взял бы базу из подсказки
+            # instance, и связанные объекты читались бы с реплики.
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика хранит те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
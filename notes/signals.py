@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Length
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .changes import record_changes
+from .drafts import buffer as drafts
+from .models import Note, NoteChange, Tag
+from .similarity import index_note
+from .stats import apply_delta
+
+_handled_in_bulk = ContextVar('notes_delete_handled_in_bulk', default=False)
+
+
+@contextmanager
+def delete_handled_in_bulk():
+    """Отключает обработчики удаления заметок.
+
+    Нужен, когда вызывающий код сам обновил журнал, статистику
+    и счётчики тегов для всей пачки удаляемых заметок.
+    """
+    token = _handled_in_bulk.set(True)
+    try:
+        yield
+    finally:
+        _handled_in_bulk.reset(token)
+
+
+def _skip_delete_hooks(origin):
+    """Журнал и статистику не нужно обновлять при удалении заметки.
+
+    При удалении пользователя они удаляются вместе с ним, а при
+    пакетном удалении уже обновлены.
+    """
+    return isinstance(origin, get_user_model()) or _handled_in_bulk.get()
+
+
+@receiver(post_save, sender=Note)
+def update_signature(sender, instance, raw=False, **kwargs):
+    """Обновляет MinHash-сигнатуру, если изменился текст заметки."""
+    if raw:
+        return
+    index_note(instance)
+
+
+@receiver(post_save, sender=Note)
+def log_save(sender, instance, raw=False, **kwargs):
+    """Записывает изменение заметки в журнал синхронизации."""
+    if raw:
+        return
+    record_changes([instance], NoteChange.UPSERT)
+
+
+@receiver(post_delete, sender=Note)
+def log_delete(sender, instance, origin=None, **kwargs):
+    """Оставляет tombstone для удалённой заметки."""
+    if _skip_delete_hooks(origin):
+        return
+    record_changes([instance], NoteChange.DELETE)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def update_tag_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Пересчитывает число заметок у тегов при изменении связей."""
+    if action == 'pre_clear':
+        if reverse:
+            delta, tags = -instance.notes.count(), Tag.objects.filter(
+                pk=instance.pk
+            )
+        else:
+            delta, tags = -1, Tag.objects.filter(notes=instance)
+    elif action in ('post_add', 'post_remove') and pk_set:
+        sign = 1 if action == 'post_add' else -1
+        if reverse:
+            delta = sign * len(pk_set)
+            tags = Tag.objects.filter(pk=instance.pk)
+        else:
+            delta, tags = sign, Tag.objects.filter(pk__in=pk_set)
+    else:
+        return
+    tags.update(note_count=F('note_count') + delta)
+
+
+@receiver(pre_delete, sender=Note)
+def release_tags(sender, instance, origin=None, **kwargs):
+    """Уменьшает счётчики тегов удаляемой заметки."""
+    if _skip_delete_hooks(origin):
+        return
+    Tag.objects.filter(notes=instance).update(
+        note_count=F('note_count') - 1
+    )
+
+
+@receiver(pre_save, sender=Note)
+def remember_text_size(sender, instance, raw=False, **kwargs):
+    """Узнаёт прежнюю длину текста, если заметка загружена без него.
+
+    Заметка с заданным pk может быть создана вручную, минуя загрузку
+    из базы: тогда сохранение обновит существующую строку.
+    """
+    if raw or instance.pk is None or hasattr(instance, 'saved_text_size'):
+        return
+    instance.saved_text_size = Note.objects.filter(pk=instance.pk).values_list(
+        Length('text'), flat=True
+    ).first() or 0
+
+
+@receiver(post_save, sender=Note)
+def count_save(sender, instance, created, raw=False, **kwargs):
+    """Обновляет статистику автора после сохранения заметки."""
+    if raw:
+        return
+    size = len(instance.text)
+    apply_delta(
+        instance.author_id,
+        notes=int(created),
+        size=size - (0 if created else instance.saved_text_size),
+    )
+    instance.saved_text_size = size
+
+
+@receiver(post_delete, sender=Note)
+def count_delete(sender, instance, origin=None, **kwargs):
+    """Обновляет статистику автора после удаления заметки."""
+    if _skip_delete_hooks(origin):
+        return
+    apply_delta(instance.author_id, notes=-1, size=-len(instance.text))
+
+
+@receiver(post_delete, sender=Note)
+def drop_drafts(sender, instance, **kwargs):
+    """Убирает из буфера автосохранения черновики удалённой заметки."""
+    drafts.drop_note(instance.pk)
@@ -0,0 +1,135 @@
+"""Поиск похожих заметок по LSH-индексу без попарного сравнения."""
+from collections import defaultdict
+from functools import reduce
+from itertools import combinations
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import minhash
+from .models import Note, NoteBand, NoteSignature
+from .rendering import text_hash
+
+THRESHOLD = 0.5
+SIMILAR_LIMIT = 5
+# Бакет, в который попало больше групп заметок, почти ничего не говорит
+# о сходстве, а число пар в нём растёт квадратично.
+MAX_BUCKET = 50
+
+
+@transaction.atomic
+def store_signatures(rows):
+    """Сохраняет сигнатуры и пересобирает полосы.
+
+    rows - последовательность кортежей
+    (note_id, author_id, хеш текста, сигнатура).
+    """
+    rows = list(rows)
+    note_ids = [note_id for note_id, _, _, _ in rows]
+    NoteSignature.objects.bulk_create(
+        [NoteSignature(note_id=note_id, text_hash=digest, minhash=packed)
+         for note_id, _, digest, packed in rows],
+        update_conflicts=True,
+        unique_fields=('note',),
+        update_fields=('text_hash', 'minhash'),
+    )
+    NoteBand.objects.filter(note_id__in=note_ids).delete()
+    NoteBand.objects.bulk_create(
+        NoteBand(note_id=note_id, author_id=author_id,
+                 band=band, bucket=bucket)
+        for note_id, author_id, _, packed in rows
+        if not minhash.is_empty(packed)
+        for band, bucket in minhash.bands(packed)
+    )
+
+
+def index_note(note):
+    """Пересчитывает сигнатуру заметки, если изменился текст.
+
+    Текст сравнивается с тем, по которому посчитана сохранённая
+    сигнатура, поэтому изменения в обход save тоже будут замечены.
+    """
+    digest = text_hash(note.text)
+    if NoteSignature.objects.filter(note=note, text_hash=digest).exists():
+        return
+    store_signatures(
+        [(note.pk, note.author_id, digest, minhash.signature(note.text))]
+    )
+
+
+def find_similar(note, limit=SIMILAR_LIMIT):
+    """Похожие заметки того же автора, отсортированные по сходству."""
+    packed = NoteSignature.objects.filter(note=note).values_list(
+        'minhash', flat=True
+    ).first()
+    if packed is None or minhash.is_empty(packed):
+        return []
+    lookup = reduce(or_, (
+        Q(band=band, bucket=bucket)
+        for band, bucket in minhash.bands(bytes(packed))
+    ))
+    candidates = NoteBand.objects.filter(
+        lookup, author_id=note.author_id
+    ).exclude(note_id=note.pk).values('note_id')
+    scores = {
+        note_id: minhash.similarity(packed, other)
+        for note_id, other in NoteSignature.objects.filter(
+            note_id__in=candidates
+        ).values_list('note_id', 'minhash')
+    }
+    best = sorted(
+        (note_id for note_id, score in scores.items() if score >= THRESHOLD),
+        key=lambda note_id: -scores[note_id],
+    )[:limit]
+    notes = Note.objects.in_bulk(best)
+    similar = []
+    for note_id in best:
+        notes[note_id].similarity = scores[note_id]
+        similar.append(notes[note_id])
+    return similar
+
+
+def find_duplicates(author):
+    """Пары похожих заметок автора для отчёта о дубликатах.
+
+    Заметки с одинаковой сигнатурой объединяются в группу, и в отчёт
+    попадают пары с первой заметкой группы, а не все пары внутри неё.
+    Сигнатуры сравниваются только у групп, попавших в общий бакет
+    хотя бы одной полосы; бакеты больше MAX_BUCKET пропускаются.
+    """
+    groups = defaultdict(list)
+    for note_id, packed in NoteSignature.objects.filter(
+        note__author=author
+    ).order_by('note_id').values_list('note_id', 'minhash').iterator():
+        groups[bytes(packed)].append(note_id)
+    signatures = {}
+    scored = []
+    for packed, note_ids in groups.items():
+        if minhash.is_empty(packed):
+            continue
+        signatures[note_ids[0]] = packed
+        scored.extend((1.0, note_ids[0], other) for other in note_ids[1:])
+    buckets = defaultdict(set)
+    for band, bucket, note_id in NoteBand.objects.filter(
+        author=author
+    ).values_list('band', 'bucket', 'note_id').iterator():
+        if note_id in signatures:
+            buckets[band, bucket].add(note_id)
+    pairs = {
+        pair
+        for note_ids in buckets.values() if len(note_ids) <= MAX_BUCKET
+        for pair in combinations(sorted(note_ids), 2)
+    }
+    for first, second in pairs:
+        score = minhash.similarity(signatures[first], signatures[second])
+        if score >= THRESHOLD:
+            scored.append((score, first, second))
+    scored.sort(key=lambda item: (-item[0], item[1], item[2]))
+    notes = Note.objects.in_bulk(
+        {note_id for _, first, second in scored for note_id in (first, second)}
+    )
+    return [
+        (notes[first], notes[second], score)
+        for score, first, second in scored
+    ]
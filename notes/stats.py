@@ -0,0 +1,100 @@
+"""Статистика заметок пользователя, обновляемая по приращениям."""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce, Length
+from django.utils import timezone
+
+from .models import Note, NoteChange, NoteStats
+
+
+def sizes_by_author(notes):
+    """Число и суммарная длина заметок из notes по авторам."""
+    return {
+        row['author_id']: (row['count'], row['size'])
+        for row in notes.values('author_id').annotate(
+            count=Count('id'), size=Coalesce(Sum(Length('text')), 0)
+        ).order_by()
+    }
+
+
+def apply_sizes(before, after):
+    """Сдвигает статистику авторов на разницу двух sizes_by_author."""
+    for author_id in before.keys() | after.keys():
+        count, size = before.get(author_id, (0, 0))
+        new_count, new_size = after.get(author_id, (0, 0))
+        apply_delta(author_id, notes=new_count - count, size=new_size - size)
+
+
+def compute_stats(author_ids):
+    """Статистика авторов, посчитанная по таблице заметок."""
+    stats = {
+        author_id: NoteStats(author_id=author_id) for author_id in author_ids
+    }
+    for author_id, (count, size) in sizes_by_author(
+        Note.objects.filter(author_id__in=author_ids)
+    ).items():
+        stats[author_id].note_count = count
+        stats[author_id].text_size = size
+    for row in NoteChange.objects.filter(author_id__in=author_ids).values(
+        'author_id'
+    ).annotate(last=Max('created')).order_by():
+        stats[row['author_id']].last_edited = row['last']
+    return stats
+
+
+def apply_delta(author_id, notes=0, size=0):
+    """Атомарно сдвигает счётчики автора и отметку последней правки.
+
+    Если строки статистики ещё нет, она строится по таблице заметок
+    целиком - один раз для каждого автора.
+    """
+    values = {
+        'note_count': F('note_count') + notes,
+        'text_size': F('text_size') + size,
+        'last_edited': timezone.now(),
+    }
+    if NoteStats.objects.filter(author_id=author_id).update(**values):
+        return
+    try:
+        with transaction.atomic():
+            compute_stats([author_id])[author_id].save(force_insert=True)
+    except IntegrityError:
+        NoteStats.objects.filter(author_id=author_id).update(**values)
+
+
+def get_stats(author):
+    """Статистика автора одним запросом по первичному ключу."""
+    stats = NoteStats.objects.filter(author=author).first()
+    if stats is None:
+        stats = compute_stats([author.pk])[author.pk]
+        NoteStats.objects.bulk_create([stats], ignore_conflicts=True)
+    return stats
+
+
+@transaction.atomic
+def reconcile(author_ids, repair=True):
+    """Сверяет статистику пачки авторов с таблицей заметок.
+
+    Сверка и исправление идут в одной транзакции, чтобы не затереть
+    приращения от правок, сделанных между ними. Возвращает id авторов,
+    у которых статистика разошлась с фактической или отсутствовала.
+    """
+    actual = compute_stats(author_ids)
+    stored = NoteStats.objects.in_bulk(author_ids)
+    drifted = [
+        author_id for author_id, stats in actual.items()
+        if author_id not in stored
+        or (stored[author_id].note_count, stored[author_id].text_size)
+        != (stats.note_count, stats.text_size)
+    ]
+    if repair and drifted:
+        for author_id in drifted:
+            if author_id in stored and stored[author_id].last_edited:
+                actual[author_id].last_edited = stored[author_id].last_edited
+        NoteStats.objects.bulk_create(
+            [actual[author_id] for author_id in drifted],
+            update_conflicts=True,
+            unique_fields=('author',),
+            update_fields=('note_count', 'text_size', 'last_edited'),
+        )
+    return drifted
@@ -0,0 +1,51 @@
+"""Теги заметок: сохранение и фильтрация списка."""
+from django.db import transaction
+from django.db.models import Count
+
+from .models import NoteTag, Tag
+
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+
+def normalize_tags(names):
+    """Названия тегов в том виде, в каком они хранятся, без повторов."""
+    names = (name.strip().lower() for name in names)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def parse_tags(value):
+    """Уникальные названия тегов из строки через запятую."""
+    return normalize_tags(value.split(','))
+
+
+def format_tags(note):
+    return ', '.join(tag.name for tag in note.tags.all())
+
+
+@transaction.atomic
+def set_tags(note, names):
+    """Привязывает к заметке теги автора, создавая недостающие."""
+    Tag.objects.bulk_create(
+        [Tag(author_id=note.author_id, name=name) for name in names],
+        ignore_conflicts=True,
+    )
+    note.tags.set(Tag.objects.filter(author_id=note.author_id, name__in=names))
+
+
+def filter_by_tags(notes, author, names, match=MATCH_ALL):
+    """Оставляет заметки, у которых есть все (или любой) из тегов."""
+    names = normalize_tags(names)
+    if not names:
+        return notes
+    tag_ids = list(Tag.objects.filter(
+        author=author, name__in=names
+    ).values_list('pk', flat=True))
+    if match != MATCH_ANY and len(tag_ids) < len(names):
+        return notes.none()
+    links = NoteTag.objects.filter(tag_id__in=tag_ids)
+    if match != MATCH_ANY:
+        links = links.values('note_id').annotate(
+            matched=Count('tag_id')
+        ).filter(matched=len(tag_ids))
+    return notes.filter(pk__in=links.values('note_id'))
@@ -10,6 +10,29 @@ urlpatterns = [
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
+    path('batch/', views.NoteBatch.as_view(), name='batch'),
+    path('drafts/', views.DraftSave.as_view(), name='draft'),
+    path('drafts/<slug:slug>/', views.DraftSave.as_view(), name='draft'),
+    path(
+        'note/<slug:slug>/attachments/',
+        views.AttachmentUpload.as_view(),
+        name='attachment_upload',
+    ),
+    path(
+        'attachments/<int:pk>/',
+        views.AttachmentDownload.as_view(),
+        name='attachment',
+    ),
+    path(
+        'attachments/<int:pk>/delete/',
+        views.AttachmentDelete.as_view(),
+        name='attachment_delete',
+    ),
+    path('export/', views.NoteExport.as_view(), name='export'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('api/notes/', views.NotesListApi.as_view(), name='api_list'),
+    path('duplicates/', views.NoteDuplicates.as_view(), name='duplicates'),
+    path('changes/', views.NoteChanges.as_view(), name='changes'),
+    path('events/', views.NoteEvents.as_view(), name='events'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
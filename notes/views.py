@@ -1,9 +1,36 @@
+import json
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
+from .attachments import BlobUploadHandler, serve, store_blob
+from .batch import (DELETED, INVALID, MAX_BATCH, NOT_FOUND, UPDATED,
+                    batch_delete, batch_update)
+from .changes import (DEFAULT_LIMIT, MAX_LIMIT, CursorExpired,
+                      changes_since)
+from .drafts import FIELDS as DRAFT_FIELDS
+from .drafts import buffer as drafts
+from .drafts import draft_key
+from .events import OVERFLOW, broker
+from .export import aiterate, export_archive
 from .forms import NoteForm
-from .models import Note
+from .models import Attachment, Note, Tag
+from .similarity import find_duplicates, find_similar
+from .tags import MATCH_ALL, filter_by_tags, normalize_tags
 
 
 class Home(generic.TemplateView):
@@ -26,34 +53,403 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
+class DraftMixin:
+    """Черновик автосохранения в форме заметки."""
+
+    def get_draft_key(self):
+        return draft_key(getattr(self, 'object', None))
+
+    def get_initial(self):
+        initial = super().get_initial()
+        if self.request.method == 'GET':
+            initial.update(
+                drafts.load(self.request.user.pk, self.get_draft_key())
+            )
+        return initial
+
+    def form_valid(self, form):
+        key = self.get_draft_key()
+        response = super().form_valid(form)
+        transaction.on_commit(
+            lambda: drafts.discard(self.request.user.pk, key)
+        )
+        return response
+
+
+class NoteCreate(NoteBase, DraftMixin, generic.CreateView):
     """Добавление заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteBase, DraftMixin, generic.UpdateView):
     """Редактирование заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
 
+class DraftSave(NoteBase, generic.View):
+    """Приём автосохранений формы заметки.
+
+    Изменения только попадают в буфер и записываются в базу пачками.
+    Черновики длиннее NOTES_DRAFTS_MAX_SIZE символов не принимаются,
+    чтобы буфер не занимал больше памяти, чем рассчитано.
+    """
+
+    def post(self, request, slug=None):
+        note = None
+        if slug is not None:
+            note = get_object_or_404(self.get_queryset(), slug=slug)
+        fields = {name: request.POST[name]
+                  for name in DRAFT_FIELDS if name in request.POST}
+        if sum(map(len, fields.values())) > settings.NOTES_DRAFTS_MAX_SIZE:
+            return JsonResponse(
+                {'error': 'Черновик слишком большой для автосохранения'},
+                status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+        drafts.add(request.user.pk, draft_key(note), note and note.pk, fields)
+        return JsonResponse({'saved': True}, status=HTTPStatus.ACCEPTED)
+
+
 class NoteDelete(NoteBase, generic.DeleteView):
     """Удаление заметки."""
     template_name = 'notes/delete.html'
 
 
+class NoteBatch(NoteBase, generic.View):
+    """Пакетное удаление и правка заметок одной транзакцией.
+
+    JSON-запрос: {"action": "delete", "notes": [slug или id, ...]} или
+    {"action": "update", "notes": [{"note": slug или id, "title": ...,
+    "slug": ...}, ...]}; в ответе статус каждой заметки. Форма списка
+    заметок передаёт action, slug выбранных заметок в note и title;
+    итог и ошибки по отдельным заметкам показываются в списке.
+    """
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            return self.post_json(request)
+        action = request.POST.get('action')
+        refs = request.POST.getlist('note')
+        if action not in ('delete', 'update') or len(refs) > MAX_BATCH:
+            return HttpResponseBadRequest('Неверный пакетный запрос')
+        if not refs:
+            messages.warning(request, 'Не выбрано ни одной заметки')
+        elif action == 'delete':
+            self.report(batch_delete(self.get_queryset(), refs))
+        else:
+            title = request.POST.get('title', '')
+            self.report(batch_update(
+                self.get_queryset(),
+                [{'note': ref, 'title': title} for ref in refs],
+            ))
+        return redirect('notes:list')
+
+    def report(self, results):
+        done = [result for result in results
+                if result['status'] in (DELETED, UPDATED)]
+        if done:
+            verb = 'Удалено' if done[0]['status'] == DELETED else 'Изменено'
+            messages.success(self.request, f'{verb} заметок: {len(done)}')
+        for result in results:
+            if result['status'] == NOT_FOUND:
+                messages.error(
+                    self.request, f'{result["note"]}: заметка не найдена'
+                )
+            elif result['status'] == INVALID:
+                errors = '; '.join(
+                    error['message']
+                    for field_errors in result['errors'].values()
+                    for error in field_errors
+                )
+                messages.error(self.request, f'{result["note"]}: {errors}')
+
+    def post_json(self, request):
+        try:
+            payload = json.loads(request.body)
+            action, refs = payload['action'], payload['notes']
+        except (ValueError, TypeError, KeyError):
+            return self.error('Ожидается JSON с полями action и notes')
+        if not isinstance(refs, list) or len(refs) > MAX_BATCH:
+            return self.error(f'notes - список не длиннее {MAX_BATCH}')
+        if action == 'delete':
+            if not all(isinstance(ref, (int, str)) for ref in refs):
+                return self.error('Заметки задаются slug или id')
+            results = batch_delete(self.get_queryset(), refs)
+        elif action == 'update':
+            if not all(isinstance(item, dict)
+                       and isinstance(item.get('note'), (int, str))
+                       for item in refs):
+                return self.error('Правки задаются объектами с полем note')
+            results = batch_update(self.get_queryset(), refs)
+        else:
+            return self.error('action - delete или update')
+        return JsonResponse({'results': results})
+
+    @staticmethod
+    def error(message):
+        return JsonResponse(
+            {'error': message}, status=HTTPStatus.BAD_REQUEST
+        )
+
+
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """Список всех заметок пользователя.
+
+    Параметры tag (можно несколько) и match=all|any фильтруют заметки
+    по тегам. Теги всех заметок страницы загружаются одним запросом.
+    """
     template_name = 'notes/list.html'
+    paginate_by = 100
+
+    def get_queryset(self):
+        self.selected_tags = normalize_tags(self.request.GET.getlist('tag'))
+        self.match = self.request.GET.get('match', MATCH_ALL)
+        notes = filter_by_tags(
+            super().get_queryset(), self.request.user,
+            self.selected_tags, self.match,
+        )
+        return notes.order_by('pk').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('name'))
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tags'] = Tag.objects.filter(
+            author=self.request.user, note_count__gt=0
+        ).order_by('name')
+        context['selected_tags'] = self.selected_tags
+        context['match'] = self.match
+        context['filter_query'] = self.request.GET.copy()
+        context['filter_query'].pop('page', None)
+        return context
+
+
+class NotesListApi(NotesList):
+    """Список заметок пользователя в JSON с той же фильтрацией."""
+
+    def render_to_response(self, context, **response_kwargs):
+        page = context['page_obj']
+        return JsonResponse({
+            'notes': [
+                {
+                    'id': note.id,
+                    'slug': note.slug,
+                    'title': note.title,
+                    'tags': [tag.name for tag in note.tags.all()],
+                }
+                for note in context['object_list']
+            ],
+            'page': page.number,
+            'has_next': page.has_next(),
+        })
 
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['similar_notes'] = find_similar(self.object)
+        return context
+
+
+class NoteDuplicates(NoteBase, generic.TemplateView):
+    """Отчёт о похожих заметках пользователя."""
+    template_name = 'notes/duplicates.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['duplicates'] = find_duplicates(self.request.user)
+        return context
+
+
+class NoteExport(NoteBase, generic.View):
+    """Выгрузка всех заметок пользователя в ZIP-архив.
+
+    Архив формируется на лету. Заметки идут по возрастанию id, поэтому
+    прерванную выгрузку можно продолжить параметром after со slug
+    последнего полностью полученного файла.
+    """
+
+    def get(self, request, *args, **kwargs):
+        after = request.GET.get('after')
+        after_pk = 0
+        filename = 'notes.zip'
+        if after:
+            after_pk = get_object_or_404(self.get_queryset(), slug=after).pk
+            filename = f'notes-after-{after}.zip'
+        chunks = export_archive(request.user, after_pk)
+        if isinstance(request, ASGIRequest):
+            chunks = aiterate(chunks)
+        response = StreamingHttpResponse(
+            chunks, content_type='application/zip'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
+
+
+class NoteChanges(LoginRequiredMixin, generic.View):
+    """Изменения заметок пользователя после курсора since."""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return JsonResponse(
+                {'error': 'since и limit должны быть целыми числами'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        try:
+            changes, cursor, has_more = changes_since(
+                request.user, since, limit
+            )
+        except CursorExpired:
+            return JsonResponse(
+                {'error': 'Курсор устарел, выполните полную синхронизацию',
+                 'cursor': 0},
+                status=HTTPStatus.GONE,
+            )
+        return JsonResponse(
+            {'changes': changes, 'cursor': cursor, 'has_more': has_more}
+        )
+
+
+class NoteEvents(generic.View):
+    """SSE-поток изменений заметок пользователя.
+
+    Представление асинхронное: простаивающее соединение занимает
+    только корутину в event loop ASGI-сервера, а не поток. Под WSGI
+    Django собрал бы бесконечный поток в список и повесил воркер,
+    поэтому там поток не отдаётся.
+    """
+    keepalive = 15
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(
+                'Поток событий доступен только под ASGI-сервером',
+                status=HTTPStatus.NOT_IMPLEMENTED,
+            )
+        last_event_id = request.headers.get(
+            'Last-Event-ID', request.GET.get('since')
+        )
+        try:
+            since = int(last_event_id) if last_event_id else None
+        except ValueError:
+            since = None
+        response = StreamingHttpResponse(
+            self.stream(user, since), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, user, since):
+        # Подписываемся до чтения журнала, чтобы не потерять изменения,
+        # сделанные между чтением и подпиской.
+        subscription = broker.subscribe(user.pk)
+        try:
+            if since is not None:
+                async for chunk, since in self.replay(user, since):
+                    yield chunk
+            while True:
+                event = await subscription.get(self.keepalive)
+                if event is None:
+                    yield ': keepalive\n\n'
+                elif event is OVERFLOW:
+                    # Клиент переподключится и догонит по Last-Event-ID.
+                    return
+                elif since is None or event['seq'] > since:
+                    yield self.format(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    async def replay(self, user, since):
+        """Изменения из журнала после since вместе с новым курсором."""
+        has_more = True
+        try:
+            while has_more:
+                changes, since, has_more = await sync_to_async(
+                    changes_since
+                )(user, since, MAX_LIMIT)
+                for change in changes:
+                    yield self.format(change), since
+        except CursorExpired:
+            yield self.format({'seq': 0}, 'reset'), since
+
+    @staticmethod
+    def format(event, name=None):
+        data = json.dumps(event, ensure_ascii=False)
+        return (f'id: {event["seq"]}\n'
+                f'event: {name or event.get("op", "message")}\n'
+                f'data: {data}\n\n')
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AttachmentUpload(NoteBase, generic.View):
+    """Загрузка вложения к заметке.
+
+    Файл пишется на диск по мере поступления, поэтому обработчик
+    загрузки заменяется до разбора тела запроса, а проверка CSRF
+    переносится из middleware в сам метод post.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers = [BlobUploadHandler(request)]
+        return super().dispatch(request, *args, **kwargs)
+
+    @method_decorator(csrf_protect)
+    def post(self, request, slug):
+        note = get_object_or_404(self.get_queryset(), slug=slug)
+        uploaded = request.FILES.get('file')
+        if uploaded is None:
+            return HttpResponseBadRequest('Файл не передан')
+        with transaction.atomic():
+            Attachment.objects.create(
+                note=note,
+                author=request.user,
+                blob=store_blob(uploaded),
+                name=uploaded.name[:255],
+                content_type=(uploaded.content_type
+                              or 'application/octet-stream'),
+            )
+        return redirect('notes:detail', slug=note.slug)
+
+
+class AttachmentBase(LoginRequiredMixin):
+    """Пользователь может работать только со своими вложениями."""
+
+    def get_attachment(self, pk):
+        return get_object_or_404(
+            Attachment.objects.select_related('blob', 'note'),
+            pk=pk,
+            author=self.request.user,
+        )
+
+
+class AttachmentDownload(AttachmentBase, generic.View):
+    """Скачивание вложения."""
+
+    def get(self, request, pk):
+        return serve(request, self.get_attachment(pk))
+
+
+class AttachmentDelete(AttachmentBase, generic.View):
+    """Удаление вложения; файл удалит фоновая очистка."""
+
+    def post(self, request, pk):
+        attachment = self.get_attachment(pk)
+        attachment.delete()
+        return redirect('notes:detail', slug=attachment.note.slug)
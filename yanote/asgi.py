@@ -3,6 +3,11 @@ ASGI config for yanote project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The SSE endpoint ``/events/`` holds connections open for a long time and
+should be served through this application (e.g. with
+``uvicorn yanote.asgi:application``) rather than WSGI, where every open
+stream occupies a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
@@ -23,6 +23,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'notes.middleware.AdmissionControlMiddleware',
+    'notes.middleware.ReadReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -44,6 +46,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notes.context_processors.note_stats',
             ],
         },
     },
@@ -56,7 +59,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # В режиме WAL читатели не блокируют писателя и друг друга.
+        # Транзакции сразу берут блокировку записи: иначе транзакция,
+        # начавшаяся с чтения, падает с database is locked, если кто-то
+        # записал раньше неё.
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL',
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Тот же файл, открытый только на чтение, для безопасных запросов.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': (BASE_DIR / 'db.sqlite3').as_uri() + '?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['notes.routers.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Корзины токенов ограничителя частоты запросов. Кеш вытесняет давно
+    # не использованные ключи, поэтому MAX_ENTRIES должен покрывать всех
+    # клиентов, активных в пределах burst / rate секунд.
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
 }
 
 
@@ -87,3 +120,52 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+# Интервал опроса журнала изменений для рассылки SSE-событий (в секундах).
+# Включается, когда приложение запущено в нескольких процессах: события
+# из других процессов доходят до подписчиков через общую базу данных.
+NOTES_EVENTS_OUTBOX_POLL = None
+
+# Сколько запросов воркер обрабатывает одновременно; остальные получают 503.
+NOTES_MAX_CONCURRENT_REQUESTS = 64
+
+NOTES_RATE_LIMIT_CACHE = 'ratelimit'
+# Число процессов-воркеров на сервере: корзины у каждого свои, поэтому
+# лимиты делятся между ними.
+NOTES_RATE_LIMIT_WORKERS = 1
+
+# Корзины токенов по имени URL: rate - токенов в секунду, burst - ёмкость,
+# methods - ограничиваемые методы (по умолчанию все); None вместо правила
+# снимает ограничение. Правило '*' действует для маршрутов без собственного
+# правила; оно ограничивает только запросы, меняющие данные. Вход
+# и регистрация дороги из-за хеширования паролей, поэтому ограничены
+# отдельно и строже.
+NOTES_RATE_LIMITS = {
+    'users:login': {'rate': 5 / 60, 'burst': 5, 'methods': ('POST',)},
+    'users:signup': {'rate': 1 / 60, 'burst': 3, 'methods': ('POST',)},
+    'notes:add': {'rate': 1, 'burst': 20, 'methods': ('POST',)},
+    # Автосохранение и так копится в буфере черновиков.
+    'notes:draft': None,
+    '*': {
+        'rate': 20,
+        'burst': 100,
+        'methods': ('POST', 'PUT', 'PATCH', 'DELETE'),
+    },
+}
+
+# Автосохранение черновиков: интервал сброса буфера в базу (в секундах),
+# число черновиков в буфере, при котором он сбрасывается досрочно, и
+# наибольший размер черновика в символах. Вместе они ограничивают память
+# буфера: не больше 500 черновиков по 50 000 символов.
+NOTES_DRAFTS_FLUSH_INTERVAL = 2
+NOTES_DRAFTS_MAX_PENDING = 500
+NOTES_DRAFTS_MAX_SIZE = 50_000
+
+# Хранилище вложений: файлы лежат по SHA-256 содержимого.
+NOTES_BLOB_ROOT = BASE_DIR / 'media' / 'blobs'
+NOTES_ATTACHMENT_MAX_SIZE = 50 * 1024 * 1024
+
+# Алиас базы для чтения в GET-запросах; None - читать из default.
+NOTES_READ_REPLICA = 'replica'
+# Сколько секунд после записи запросы клиента читают из default.
+NOTES_READ_REPLICA_PIN = 5